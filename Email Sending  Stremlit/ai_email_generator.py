@@ -1,13 +1,22 @@
 import random
 import os
-import requests
-import json
+import asyncio
+import httpx
+import orjson
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Pooled HTTP/2 client shared by every OpenRouter call so repeated generations
+# reuse one TCP+TLS connection instead of handshaking each time
+http_client = httpx.Client(http2=True, timeout=30.0,
+                           limits=httpx.Limits(max_keepalive_connections=10))
+
 class AIEmailGenerator:
     def __init__(self):
         self.email_templates = {
@@ -188,6 +197,49 @@ class AIEmailGenerator:
 
     def _generate_with_openrouter(self, lead_data: Dict, tone: str, api_key: str) -> Optional[Dict]:
         """Call OpenRouter API to generate high-quality email"""
+        headers, payload = self._openrouter_request(lead_data, tone, api_key)
+        try:
+            response = http_client.post(OPENROUTER_URL, headers=headers, json=payload)
+            return self._parse_openrouter_response(lead_data, response)
+        except Exception as e:
+            print(f"OpenRouter Request error: {e}")
+        return None
+    
+    async def generate_emails_async(self, leads: List[Dict], campaign_type: str = 'professional',
+                                    api_key: str = None, concurrency: int = 5) -> List[Dict]:
+        """Generate emails for many leads, running OpenRouter calls concurrently
+        
+        Requests share one pooled HTTP/2 connection; leads whose AI call fails
+        fall back to the template system like ``generate_email``.
+        """
+        if not api_key:
+            return [self.generate_email(lead, campaign_type) for lead in leads]
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def generate(client: httpx.AsyncClient, lead_data: Dict) -> Dict:
+            headers, payload = self._openrouter_request(lead_data, campaign_type, api_key)
+            ai_content = None
+            try:
+                async with semaphore:
+                    response = await client.post(OPENROUTER_URL, headers=headers, json=payload)
+                ai_content = self._parse_openrouter_response(lead_data, response)
+            except Exception as e:
+                print(f"OpenRouter Request error: {e}")
+            if not ai_content:
+                return self.generate_email(lead_data, campaign_type)
+            ai_content.update({
+                'lead_email': lead_data.get('email', ''),
+                'lead_company': lead_data.get('company', ''),
+                'campaign_type': campaign_type
+            })
+            return ai_content
+        
+        async with httpx.AsyncClient(http2=True, timeout=30.0) as client:
+            return await asyncio.gather(*[generate(client, lead) for lead in leads])
+    
+    def _openrouter_request(self, lead_data: Dict, tone: str, api_key: str) -> tuple:
+        """Build the headers and JSON payload for an OpenRouter completion"""
         headers = {
             "Authorization": f"Bearer {api_key}",
             "HTTP-Referer": "http://localhost:8501",
@@ -207,40 +259,38 @@ class AIEmailGenerator:
         Format the response as a JSON object with 'subject' and 'body' keys.
         """
         
-        try:
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json={
-                    "model": "google/gemma-3-12b:free",
-                    "messages": [
-                        {"role": "system", "content": "You are an expert sales copywriter. Return ONLY JSON."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "response_format": { "type": "json_object" }
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                content = response.json()['choices'][0]['message']['content']
-                # Strip potential markdown code blocks
-                if "```json" in content:
-                    content = content.split("```json")[1].split("```")[0].strip()
-                elif "```" in content:
-                    content = content.split("```")[1].split("```")[0].strip()
-                    
-                res_json = json.loads(content)
-                return {
-                    'subject': res_json.get('subject', 'Opportunity for you'),
-                    'body': res_json.get('body', ''),
-                    'lead_name': lead_data.get('name', ''),
-                    'type': 'ai_generated',
-                    'generated_at': datetime.now().isoformat()
-                }
-        except Exception as e:
-            print(f"OpenRouter Request error: {e}")
+        payload = {
+            "model": "google/gemma-3-12b:free",
+            "messages": [
+                {"role": "system", "content": "You are an expert sales copywriter. Return ONLY JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            "response_format": { "type": "json_object" }
+        }
+        return headers, payload
+    
+    def _parse_openrouter_response(self, lead_data: Dict, response: httpx.Response) -> Optional[Dict]:
+        """Extract the subject/body JSON from an OpenRouter completion"""
+        if response.status_code == 200:
+            content = orjson.loads(response.content)['choices'][0]['message']['content']
+            # Strip potential markdown code blocks
+            if "```json" in content:
+                content = content.split("```json")[1].split("```")[0].strip()
+            elif "```" in content:
+                content = content.split("```")[1].split("```")[0].strip()
+                
+            res_json = orjson.loads(content)
+            return {
+                'subject': res_json.get('subject', 'Opportunity for you'),
+                'body': res_json.get('body', ''),
+                'lead_name': lead_data.get('name', ''),
+                'type': 'ai_generated',
+                'generated_at': datetime.now().isoformat()
+            }
         return None
 
-# Global AI email generator instance
-ai_email_generator = AIEmailGenerator()
+# Global AI email generator instance, created on first use
+@lru_cache(maxsize=1)
+def get_ai_email_generator() -> AIEmailGenerator:
+    """Return the shared AIEmailGenerator"""
+    return AIEmailGenerator()
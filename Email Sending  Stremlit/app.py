@@ -70,7 +70,9 @@ def load_css():
         left: 0;
         right: 0;
         bottom: 0;
-        background: url('data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><defs><pattern id="grid" width="10" height="10" patternUnits="userSpaceOnUse"><path d="M 10 0 L 0 0 0 10" fill="none" stroke="rgba(255,255,255,0.1)" stroke-width="0.5"/></pattern></defs><rect width="100" height="100" fill="url(%23grid)"/></svg>');
+        background:
+            repeating-linear-gradient(0deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px),
+            repeating-linear-gradient(90deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px);
         opacity: 0.3;
     }
     
@@ -2,7 +2,7 @@
 SQLAlchemy models for LeadAI Pro
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Float, ForeignKey, JSON, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import sys
@@ -82,6 +82,25 @@ class Lead(Base):
     user = relationship("User", back_populates="leads")
     emails = relationship("Email", back_populates="lead")
 
+# Full-text search column for leads (PostgreSQL only). Kept out of the mapped
+# model so the SQLite development database is unaffected; queried through
+# LeadService.search_leads.
+event.listen(
+    Lead.__table__,
+    "after_create",
+    DDL(
+        "ALTER TABLE leads ADD COLUMN search_vec TSVECTOR GENERATED ALWAYS AS ("
+        "to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || "
+        "coalesce(email, '') || ' ' || coalesce(company, '') || ' ' || coalesce(job_title, ''))"
+        ") STORED"
+    ).execute_if(dialect="postgresql")
+)
+event.listen(
+    Lead.__table__,
+    "after_create",
+    DDL("CREATE INDEX leads_search_gin ON leads USING gin(search_vec)").execute_if(dialect="postgresql")
+)
+
 class Campaign(Base):
     """Email campaign model"""
     __tablename__ = "campaigns"
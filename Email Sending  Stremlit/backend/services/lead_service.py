@@ -3,8 +3,10 @@ Lead management service
 """
 
 import pandas as pd
+import numpy as np
 import re
 from typing import List, Dict, Any, Tuple
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from ..models import Lead, User
 from ..schemas import LeadCreate, LeadResponse
@@ -12,6 +14,45 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Keyword tables shared by single-lead and batch scoring
+_PERSONAL_DOMAINS = frozenset({'gmail.com', 'yahoo.com', 'hotmail.com'})
+_EXEC_TITLES = frozenset({'ceo', 'cto', 'founder', 'director', 'manager'})
+_SR_TITLES = frozenset({'senior', 'lead', 'principal'})
+_HIGH_VALUE_INDUSTRIES = frozenset({'technology', 'finance', 'healthcare'})
+
+# Job titles are matched word by word against the keyword sets
+_TITLE_TOKEN_RE = re.compile(r'\w+')
+_EXEC_TITLE_RE = r'\b(?:' + '|'.join(sorted(_EXEC_TITLES)) + r')\b'
+_SR_TITLE_RE = r'\b(?:' + '|'.join(sorted(_SR_TITLES)) + r')\b'
+_INDUSTRY_KEYWORDS = {
+    'technology': ['tech', 'software', 'ai', 'data', 'cloud', 'digital'],
+    'finance': ['bank', 'financial', 'investment', 'capital', 'credit'],
+    'healthcare': ['health', 'medical', 'pharma', 'hospital', 'clinic'],
+    'retail': ['retail', 'store', 'shop', 'commerce', 'ecommerce'],
+    'manufacturing': ['manufacturing', 'factory', 'production', 'industrial'],
+    'education': ['school', 'university', 'education', 'learning', 'academy']
+}
+
+# Score contribution per title bucket (none, other, senior, executive) and
+# per industry bucket (none, other, high value)
+_TITLE_WEIGHTS = np.array([0.0, 0.1, 0.2, 0.3])
+_INDUSTRY_WEIGHTS = np.array([0.0, 0.1, 0.2])
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _score_kernel(biz, pers, comp, tbucket, phone, ibucket, out):
+        """Combine encoded lead features into scores capped at 1.0"""
+        for i in prange(out.shape[0]):
+            s = (0.3 * biz[i] + 0.1 * pers[i] + 0.2 * comp[i] + _TITLE_WEIGHTS[tbucket[i]]
+                 + 0.1 * phone[i] + _INDUSTRY_WEIGHTS[ibucket[i]])
+            out[i] = s if s < 1.0 else 1.0
+
 class LeadService:
     """Service for lead management operations"""
     
@@ -28,11 +69,16 @@ class LeadService:
             leads = []
             errors = []
             
-            for index, row in df.iterrows():
+            # Extract, validate and score lead data for all rows in one pass
+            leads_df = self._extract_leads_df(df)
+            missing_industry = leads_df['industry'].isna() & leads_df['company'].notna()
+            leads_df.loc[missing_industry, 'industry'] = self._detect_industries(
+                leads_df.loc[missing_industry, 'company']
+            )
+            leads_df['ai_score'] = self._score_leads_df(leads_df)
+            
+            for index, lead_data in zip(leads_df.index, leads_df.to_dict('records')):
                 try:
-                    # Extract and validate lead data
-                    lead_data = self._extract_lead_data(row)
-                    
                     if not lead_data['email']:
                         errors.append(f"Row {index + 1}: Missing email address")
                         continue
@@ -74,8 +120,8 @@ class LeadService:
             logger.error(f"Error processing CSV file: {str(e)}")
             raise Exception(f"Failed to process CSV file: {str(e)}")
     
-    def _extract_lead_data(self, row: pd.Series) -> Dict[str, Any]:
-        """Extract and clean lead data from CSV row"""
+    def _extract_leads_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Extract and clean lead data from all CSV rows at once"""
         # Common column name mappings
         column_mappings = {
             'email': ['email', 'e-mail', 'email_address', 'mail'],
@@ -87,55 +133,49 @@ class LeadService:
             'industry': ['industry', 'sector', 'field']
         }
         
-        lead_data = {}
+        leads_df = pd.DataFrame(index=df.index)
+        columns = {c.lower(): c for c in df.columns}
         
         # Map columns to lead fields
         for field, possible_columns in column_mappings.items():
-            value = None
-            for col in possible_columns:
-                if col.lower() in [c.lower() for c in row.index]:
-                    value = str(row[col]).strip() if pd.notna(row[col]) else None
-                    break
+            source = next((columns[col] for col in possible_columns if col in columns), None)
+            if source is None:
+                leads_df[field] = pd.Series(pd.NA, index=df.index, dtype='string')
+                continue
             
-            lead_data[field] = value if value and value != 'nan' else None
+            values = df[source].astype('string').str.strip()
+            leads_df[field] = values.mask((values == '') | (values == 'nan'))
         
         # Validate email
-        if lead_data['email']:
-            lead_data['email'] = lead_data['email'].lower().strip()
-            if not self.email_pattern.match(lead_data['email']):
-                lead_data['email'] = None
+        email = leads_df['email'].str.lower()
+        leads_df['email'] = email.where(email.str.match(self.email_pattern.pattern, na=False))
         
         # Validate phone
-        if lead_data['phone']:
-            # Clean phone number
-            phone = re.sub(r'[^\d\+]', '', lead_data['phone'])
-            if not self.phone_pattern.match(phone):
-                lead_data['phone'] = None
-            else:
-                lead_data['phone'] = phone
+        phone = leads_df['phone'].str.replace(r'[^\d\+]', '', regex=True)
+        leads_df['phone'] = phone.where(phone.str.match(self.phone_pattern.pattern, na=False))
+        
+        # Extract names from the email local part when none were given
+        local = leads_df['email'].str.split('@', n=1).str[0]
+        parts = local.str.split('.')
+        no_name = (
+            leads_df['first_name'].isna() & leads_df['last_name'].isna() & leads_df['email'].notna()
+        )
+        leads_df.loc[no_name, 'first_name'] = parts.str[0].str.title()
+        leads_df.loc[no_name, 'last_name'] = parts.str[1].str.title()
         
-        return lead_data
+        # Missing values become None so they map cleanly onto the Lead model
+        return leads_df.astype(object).where(leads_df.notna(), None)
     
     async def _enhance_lead_data(self, lead: Lead) -> Lead:
         """Enhance lead data using AI and external services"""
         try:
-            # AI-powered data completion
-            if not lead.first_name and not lead.last_name and lead.email:
-                # Try to extract name from email
-                email_local = lead.email.split('@')[0]
-                if '.' in email_local:
-                    parts = email_local.split('.')
-                    lead.first_name = parts[0].title()
-                    lead.last_name = parts[1].title()
-                else:
-                    lead.first_name = email_local.title()
-            
             # AI-powered industry detection
             if not lead.industry and lead.company:
                 lead.industry = await self._detect_industry(lead.company)
             
-            # AI-powered lead scoring
-            lead.ai_score = await self._calculate_lead_score(lead)
+            # AI-powered lead scoring (batch uploads arrive pre-scored)
+            if lead.ai_score is None:
+                lead.ai_score = await self._calculate_lead_score(lead)
             
             # Data validation and cleaning
             lead = self._clean_lead_data(lead)
@@ -150,22 +190,23 @@ class LeadService:
         """Detect industry based on company name using AI"""
         # Simple keyword-based industry detection
         # In production, this would use a more sophisticated AI model
-        industry_keywords = {
-            'technology': ['tech', 'software', 'ai', 'data', 'cloud', 'digital'],
-            'finance': ['bank', 'financial', 'investment', 'capital', 'credit'],
-            'healthcare': ['health', 'medical', 'pharma', 'hospital', 'clinic'],
-            'retail': ['retail', 'store', 'shop', 'commerce', 'ecommerce'],
-            'manufacturing': ['manufacturing', 'factory', 'production', 'industrial'],
-            'education': ['school', 'university', 'education', 'learning', 'academy']
-        }
-        
         company_lower = company_name.lower()
-        for industry, keywords in industry_keywords.items():
+        for industry, keywords in _INDUSTRY_KEYWORDS.items():
             if any(keyword in company_lower for keyword in keywords):
                 return industry.title()
         
         return 'Other'
     
+    def _detect_industries(self, companies: pd.Series) -> pd.Series:
+        """Detect industries for a batch of company names"""
+        companies_lower = companies.astype('string').str.lower()
+        conditions = [
+            companies_lower.str.contains('|'.join(keywords), regex=True, na=False).to_numpy(dtype=bool)
+            for keywords in _INDUSTRY_KEYWORDS.values()
+        ]
+        choices = [industry.title() for industry in _INDUSTRY_KEYWORDS]
+        return pd.Series(np.select(conditions, choices, default='Other'), index=companies.index)
+    
     async def _calculate_lead_score(self, lead: Lead) -> float:
         """Calculate AI-powered lead score"""
         score = 0.0
@@ -173,7 +214,7 @@ class LeadService:
         # Email domain scoring
         if lead.email:
             domain = lead.email.split('@')[1].lower()
-            if domain in ['gmail.com', 'yahoo.com', 'hotmail.com']:
+            if domain in _PERSONAL_DOMAINS:
                 score += 0.1  # Lower score for personal emails
             else:
                 score += 0.3  # Higher score for business emails
@@ -184,10 +225,10 @@ class LeadService:
         
         # Job title scoring
         if lead.job_title:
-            title_lower = lead.job_title.lower()
-            if any(keyword in title_lower for keyword in ['ceo', 'cto', 'founder', 'director', 'manager']):
+            title_tokens = set(_TITLE_TOKEN_RE.findall(lead.job_title.lower()))
+            if title_tokens & _EXEC_TITLES:
                 score += 0.3
-            elif any(keyword in title_lower for keyword in ['senior', 'lead', 'principal']):
+            elif title_tokens & _SR_TITLES:
                 score += 0.2
             else:
                 score += 0.1
@@ -198,8 +239,7 @@ class LeadService:
         
         # Industry scoring
         if lead.industry:
-            high_value_industries = ['technology', 'finance', 'healthcare']
-            if lead.industry.lower() in high_value_industries:
+            if lead.industry.lower() in _HIGH_VALUE_INDUSTRIES:
                 score += 0.2
             else:
                 score += 0.1
@@ -207,6 +247,48 @@ class LeadService:
         # Normalize score to 0-1 range
         return min(score, 1.0)
     
+    def _score_leads_df(self, leads_df: pd.DataFrame) -> np.ndarray:
+        """Score a batch of leads with the same rules as _calculate_lead_score"""
+        email = leads_df['email'].astype('string')
+        domain = email.str.split('@', n=1).str[1].str.lower()
+        has_email = email.notna().to_numpy(dtype=bool)
+        personal = domain.isin(_PERSONAL_DOMAINS).to_numpy(dtype=bool) & has_email
+        
+        title = leads_df['job_title'].astype('string').str.lower()
+        tbucket = np.select(
+            [
+                title.str.contains(_EXEC_TITLE_RE, regex=True, na=False).to_numpy(dtype=bool),
+                title.str.contains(_SR_TITLE_RE, regex=True, na=False).to_numpy(dtype=bool),
+                title.notna().to_numpy(dtype=bool),
+            ],
+            [3, 2, 1],
+            default=0,
+        ).astype(np.int8)
+        
+        industry = leads_df['industry'].astype('string').str.lower()
+        ibucket = np.select(
+            [
+                industry.isin(_HIGH_VALUE_INDUSTRIES).to_numpy(dtype=bool),
+                industry.notna().to_numpy(dtype=bool),
+            ],
+            [2, 1],
+            default=0,
+        ).astype(np.int8)
+        
+        biz = (has_email & ~personal).astype(np.int8)
+        pers = personal.astype(np.int8)
+        comp = leads_df['company'].notna().to_numpy(dtype=np.int8)
+        phone = leads_df['phone'].notna().to_numpy(dtype=np.int8)
+        
+        if NUMBA_AVAILABLE:
+            scores = np.empty(len(leads_df), dtype=np.float64)
+            _score_kernel(biz, pers, comp, tbucket, phone, ibucket, scores)
+            return scores
+        
+        scores = (0.3 * biz + 0.1 * pers + 0.2 * comp + _TITLE_WEIGHTS[tbucket]
+                  + 0.1 * phone + _INDUSTRY_WEIGHTS[ibucket])
+        return np.minimum(scores, 1.0)
+    
     def _clean_lead_data(self, lead: Lead) -> Lead:
         """Clean and standardize lead data"""
         # Clean names
@@ -229,11 +311,16 @@ class LeadService:
         
         return lead
     
-    async def search_leads(self, query: str, user_id: int, db: Session) -> List[Lead]:
+    def search_leads(self, query: str, user_id: int, db: Session) -> List[Lead]:
         """Search leads based on query"""
         leads = db.query(Lead).filter(Lead.user_id == user_id)
         
-        if query:
+        if query and db.bind.dialect.name == "postgresql":
+            # Uses the GIN-indexed search_vec column instead of a full scan
+            leads = leads.filter(
+                text("search_vec @@ plainto_tsquery('simple', :query)").bindparams(query=query)
+            )
+        elif query:
             search_filter = (
                 Lead.first_name.ilike(f"%{query}%") |
                 Lead.last_name.ilike(f"%{query}%") |
@@ -245,29 +332,40 @@ class LeadService:
         
         return leads.all()
     
-    async def get_lead_analytics(self, user_id: int, db: Session) -> Dict[str, Any]:
+    def get_lead_analytics(self, user_id: int, db: Session) -> Dict[str, Any]:
         """Get lead analytics for user"""
-        total_leads = db.query(Lead).filter(Lead.user_id == user_id).count()
-        
-        # Lead status distribution
-        status_counts = db.query(Lead.status, db.func.count(Lead.id)).filter(
-            Lead.user_id == user_id
-        ).group_by(Lead.status).all()
-        
-        # Industry distribution
-        industry_counts = db.query(Lead.industry, db.func.count(Lead.id)).filter(
-            Lead.user_id == user_id,
-            Lead.industry.isnot(None)
-        ).group_by(Lead.industry).all()
+        # Total, status distribution, industry distribution and average AI
+        # score in a single round-trip over the user's leads
+        rows = db.execute(text("""
+            WITH base AS (
+                SELECT status, industry, ai_score FROM leads WHERE user_id = :uid
+            )
+            SELECT 'total' AS kind, NULL AS label, COUNT(*) AS cnt, CAST(NULL AS FLOAT) AS avg_score FROM base
+            UNION ALL
+            SELECT 'status', status, COUNT(*), NULL FROM base GROUP BY status
+            UNION ALL
+            SELECT 'industry', industry, COUNT(*), NULL FROM base WHERE industry IS NOT NULL GROUP BY industry
+            UNION ALL
+            SELECT 'avg', NULL, NULL, AVG(ai_score) FROM base
+        """), {'uid': user_id}).all()
         
-        # AI score distribution
-        avg_score = db.query(db.func.avg(Lead.ai_score)).filter(
-            Lead.user_id == user_id
-        ).scalar() or 0
+        total_leads = 0
+        status_counts = {}
+        industry_counts = {}
+        avg_score = 0
+        for kind, label, cnt, avg in rows:
+            if kind == 'total':
+                total_leads = cnt
+            elif kind == 'status':
+                status_counts[label] = cnt
+            elif kind == 'industry':
+                industry_counts[label] = cnt
+            else:
+                avg_score = avg or 0
         
         return {
             'total_leads': total_leads,
-            'status_distribution': dict(status_counts),
-            'industry_distribution': dict(industry_counts),
+            'status_distribution': status_counts,
+            'industry_distribution': industry_counts,
             'average_ai_score': round(avg_score, 2)
         }
@@ -5,13 +5,20 @@ Generates sample data for demonstrating all platform features
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import random
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 def generate_sample_leads(n_leads=1000):
     """Generate sample lead data for demonstration"""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     
     # Sample data
     first_names = ['John', 'Jane', 'Michael', 'Sarah', 'David', 'Emily', 'Robert', 'Jessica', 
@@ -30,134 +37,121 @@ def generate_sample_leads(n_leads=1000):
     
     sources = ['Website', 'Social Media', 'Referral', 'Cold Outreach', 'Event', 'Paid Ads', 'Email Campaign']
     
-    # Generate leads
-    leads = []
-    for i in range(n_leads):
-        first_name = random.choice(first_names)
-        last_name = random.choice(last_names)
-        company = random.choice(companies)
-        industry = random.choice(industries)
-        
-        # Generate realistic email
-        email_domains = ['gmail.com', 'yahoo.com', 'hotmail.com', f'{company.lower()}.com']
-        email = f"{first_name.lower()}.{last_name.lower()}@{random.choice(email_domains)}"
-        
-        # Generate phone number
-        phone = f"+1-{random.randint(200, 999)}-{random.randint(200, 999)}-{random.randint(1000, 9999)}"
-        
-        # Generate AI score based on realistic factors
-        ai_score = np.random.beta(2, 5)  # Beta distribution for scores 0-1
-        
-        # Adjust score based on factors
-        if industry in ['Technology', 'Finance']:
-            ai_score += 0.1
-        if 'CEO' in job_titles or 'CTO' in job_titles:
-            ai_score += 0.15
-        if '@' + company.lower() + '.com' in email:
-            ai_score += 0.1
-        
-        ai_score = min(ai_score, 1.0)
-        
-        lead = {
-            'id': i + 1,
-            'first_name': first_name,
-            'last_name': last_name,
-            'email': email,
-            'company': company,
-            'phone': phone,
-            'job_title': random.choice(job_titles),
-            'industry': industry,
-            'source': random.choice(sources),
-            'ai_score': round(ai_score, 3),
-            'lead_quality': 'High' if ai_score > 0.7 else 'Medium' if ai_score > 0.4 else 'Low',
-            'status': random.choice(['New', 'Contacted', 'Qualified', 'Converted']),
-            'created_date': datetime.now() - timedelta(days=random.randint(0, 365)),
-            'notes': f'Lead from {random.choice(sources)} - {industry} industry'
-        }
-        leads.append(lead)
+    # Generate leads (one vectorized draw per column)
+    now = datetime.now()
+    first_name = rng.choice(first_names, n_leads)
+    last_name = rng.choice(last_names, n_leads)
+    company = pd.Series(rng.choice(companies, n_leads))
+    industry = rng.choice(industries, n_leads)
+    job_title = rng.choice(job_titles, n_leads)
+    
+    # Generate realistic email (personal domain or company domain)
+    personal_domains = np.array(['gmail.com', 'yahoo.com', 'hotmail.com'])
+    domain_idx = rng.integers(0, 4, n_leads)
+    company_domain = domain_idx == 3
+    domain = np.where(company_domain, company.str.lower() + '.com', personal_domains[domain_idx % 3])
+    email = (pd.Series(first_name).str.lower() + '.' + pd.Series(last_name).str.lower() + '@' + domain)
     
-    return pd.DataFrame(leads)
+    # Generate phone number
+    phone = ('+1-' + pd.Series(rng.integers(200, 1000, n_leads)).astype(str)
+             + '-' + pd.Series(rng.integers(200, 1000, n_leads)).astype(str)
+             + '-' + pd.Series(rng.integers(1000, 10000, n_leads)).astype(str))
+    
+    # Generate AI score (beta distribution) adjusted by realistic factors
+    ai_score = rng.beta(2, 5, n_leads)
+    ai_score += np.where(np.isin(industry, ['Technology', 'Finance']), 0.1, 0)
+    ai_score += np.where(np.isin(job_title, ['CEO', 'CTO']), 0.15, 0)
+    ai_score += np.where(company_domain, 0.1, 0)
+    ai_score = np.minimum(ai_score, 1.0)
+    
+    return pd.DataFrame({
+        'id': np.arange(1, n_leads + 1),
+        'first_name': first_name,
+        'last_name': last_name,
+        'email': email,
+        'company': company,
+        'phone': phone,
+        'job_title': job_title,
+        'industry': industry,
+        'source': rng.choice(sources, n_leads),
+        'ai_score': ai_score.round(3),
+        'lead_quality': np.select([ai_score > 0.7, ai_score > 0.4], ['High', 'Medium'], default='Low'),
+        'status': rng.choice(['New', 'Contacted', 'Qualified', 'Converted'], n_leads),
+        'created_date': now - pd.to_timedelta(rng.integers(0, 366, n_leads), unit='D'),
+        'notes': 'Lead from ' + pd.Series(rng.choice(sources, n_leads)) + ' - ' + industry + ' industry'
+    })
 
 def generate_sample_campaigns(n_campaigns=20):
     """Generate sample email campaign data"""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
+    now = datetime.now()
     
     campaign_types = ['Newsletter', 'Promotional', 'Follow-up', 'Welcome', 'Nurturing']
     statuses = ['Draft', 'Scheduled', 'Sending', 'Sent', 'Paused']
     
-    campaigns = []
-    for i in range(n_campaigns):
-        campaign_type = random.choice(campaign_types)
-        status = random.choice(statuses)
-        
-        # Generate realistic metrics
-        total_recipients = random.randint(50, 2000)
-        open_rate = np.random.uniform(0.15, 0.45)
-        click_rate = open_rate * np.random.uniform(0.2, 0.4)
-        bounce_rate = np.random.uniform(0.02, 0.08)
-        unsubscribe_rate = np.random.uniform(0.01, 0.05)
-        
-        opened_count = int(total_recipients * open_rate)
-        clicked_count = int(total_recipients * click_rate)
-        bounced_count = int(total_recipients * bounce_rate)
-        unsubscribed_count = int(total_recipients * unsubscribe_rate)
-        
-        campaign = {
-            'id': i + 1,
-            'name': f'{campaign_type} Campaign {i + 1}',
-            'subject': f'Exciting {campaign_type.lower()} update for you!',
-            'template_type': campaign_type.lower(),
-            'status': status,
-            'total_recipients': total_recipients,
-            'opened_count': opened_count,
-            'clicked_count': clicked_count,
-            'bounced_count': bounced_count,
-            'unsubscribed_count': unsubscribed_count,
-            'open_rate': round(open_rate * 100, 2),
-            'click_rate': round(click_rate * 100, 2),
-            'bounce_rate': round(bounce_rate * 100, 2),
-            'unsubscribe_rate': round(unsubscribe_rate * 100, 2),
-            'created_date': datetime.now() - timedelta(days=random.randint(0, 90)),
-            'sent_date': datetime.now() - timedelta(days=random.randint(0, 30)) if status == 'Sent' else None
-        }
-        campaigns.append(campaign)
+    ids = np.arange(1, n_campaigns + 1)
+    campaign_type = pd.Series(rng.choice(campaign_types, n_campaigns))
+    status = rng.choice(statuses, n_campaigns)
     
-    return pd.DataFrame(campaigns)
+    # Generate realistic metrics
+    total_recipients = rng.integers(50, 2001, n_campaigns)
+    open_rate = rng.uniform(0.15, 0.45, n_campaigns)
+    click_rate = open_rate * rng.uniform(0.2, 0.4, n_campaigns)
+    bounce_rate = rng.uniform(0.02, 0.08, n_campaigns)
+    unsubscribe_rate = rng.uniform(0.01, 0.05, n_campaigns)
+    
+    sent_date = pd.Series(now - pd.to_timedelta(rng.integers(0, 31, n_campaigns), unit='D'))
+    
+    return pd.DataFrame({
+        'id': ids,
+        'name': campaign_type + ' Campaign ' + pd.Series(ids).astype(str),
+        'subject': 'Exciting ' + campaign_type.str.lower() + ' update for you!',
+        'template_type': campaign_type.str.lower(),
+        'status': status,
+        'total_recipients': total_recipients,
+        'opened_count': (total_recipients * open_rate).astype(int),
+        'clicked_count': (total_recipients * click_rate).astype(int),
+        'bounced_count': (total_recipients * bounce_rate).astype(int),
+        'unsubscribed_count': (total_recipients * unsubscribe_rate).astype(int),
+        'open_rate': (open_rate * 100).round(2),
+        'click_rate': (click_rate * 100).round(2),
+        'bounce_rate': (bounce_rate * 100).round(2),
+        'unsubscribe_rate': (unsubscribe_rate * 100).round(2),
+        'created_date': now - pd.to_timedelta(rng.integers(0, 91, n_campaigns), unit='D'),
+        'sent_date': sent_date.where(status == 'Sent')
+    })
 
 def generate_sample_emails(n_emails=5000):
     """Generate sample email data for analytics"""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
+    now = datetime.now()
     
-    emails = []
-    for i in range(n_emails):
-        # Generate realistic email metrics
-        is_opened = np.random.choice([0, 1], p=[0.3, 0.7])
-        is_clicked = np.random.choice([0, 1], p=[0.85, 0.15]) if is_opened else 0
-        is_bounced = np.random.choice([0, 1], p=[0.95, 0.05])
-        is_unsubscribed = np.random.choice([0, 1], p=[0.98, 0.02])
-        
-        sent_date = datetime.now() - timedelta(hours=random.randint(0, 720))
-        opened_date = sent_date + timedelta(hours=random.randint(1, 48)) if is_opened else None
-        clicked_date = opened_date + timedelta(hours=random.randint(1, 24)) if is_clicked else None
-        
-        email = {
-            'id': i + 1,
-            'campaign_id': random.randint(1, 20),
-            'lead_id': random.randint(1, 1000),
-            'recipient_email': f'lead{random.randint(1, 1000)}@example.com',
-            'subject': f'Campaign {random.randint(1, 20)} - Update',
-            'sent_at': sent_date,
-            'opened_at': opened_date,
-            'clicked_at': clicked_date,
-            'is_opened': bool(is_opened),
-            'is_clicked': bool(is_clicked),
-            'is_bounced': bool(is_bounced),
-            'is_unsubscribed': bool(is_unsubscribed),
-            'clicked_link': f'https://example.com/cta{random.randint(1, 5)}' if is_clicked else None
-        }
-        emails.append(email)
+    # Generate realistic email metrics
+    is_opened = rng.random(n_emails) < 0.7
+    is_clicked = is_opened & (rng.random(n_emails) < 0.15)
+    is_bounced = rng.random(n_emails) < 0.05
+    is_unsubscribed = rng.random(n_emails) < 0.02
     
-    return pd.DataFrame(emails)
+    sent_date = pd.Series(now - pd.to_timedelta(rng.integers(0, 721, n_emails), unit='h'))
+    opened_date = sent_date + pd.to_timedelta(rng.integers(1, 49, n_emails), unit='h')
+    clicked_date = opened_date + pd.to_timedelta(rng.integers(1, 25, n_emails), unit='h')
+    clicked_link = 'https://example.com/cta' + pd.Series(rng.integers(1, 6, n_emails)).astype(str)
+    
+    return pd.DataFrame({
+        'id': np.arange(1, n_emails + 1),
+        'campaign_id': rng.integers(1, 21, n_emails),
+        'lead_id': rng.integers(1, 1001, n_emails),
+        'recipient_email': 'lead' + pd.Series(rng.integers(1, 1001, n_emails)).astype(str) + '@example.com',
+        'subject': 'Campaign ' + pd.Series(rng.integers(1, 21, n_emails)).astype(str) + ' - Update',
+        'sent_at': sent_date,
+        'opened_at': opened_date.where(is_opened),
+        'clicked_at': clicked_date.where(is_clicked),
+        'is_opened': is_opened,
+        'is_clicked': is_clicked,
+        'is_bounced': is_bounced,
+        'is_unsubscribed': is_unsubscribed,
+        'clicked_link': clicked_link.where(is_clicked)
+    })
 
 def generate_sample_analytics():
     """Generate sample analytics data"""
@@ -188,6 +182,16 @@ def generate_sample_analytics():
     
     return pd.DataFrame(daily_data)
 
+def save_demo_table(df, name):
+    """Write a demo table as CSV (plus Parquet when pyarrow is installed)"""
+    if not PYARROW_AVAILABLE:
+        df.to_csv(f'{name}.csv', index=False)
+        return
+    
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pacsv.write_csv(table, f'{name}.csv')
+    df.to_parquet(f'{name}.parquet', engine='pyarrow', compression='zstd', index=False)
+
 def create_demo_files():
     """Create demo CSV files for testing"""
     print("🎯 Creating demo data files...")
@@ -198,11 +202,11 @@ def create_demo_files():
     emails_df = generate_sample_emails(5000)
     analytics_df = generate_sample_analytics()
     
-    # Save to CSV files
-    leads_df.to_csv('demo_leads.csv', index=False)
-    campaigns_df.to_csv('demo_campaigns.csv', index=False)
-    emails_df.to_csv('demo_emails.csv', index=False)
-    analytics_df.to_csv('demo_analytics.csv', index=False)
+    # Save to CSV (and Parquet) files
+    save_demo_table(leads_df, 'demo_leads')
+    save_demo_table(campaigns_df, 'demo_campaigns')
+    save_demo_table(emails_df, 'demo_emails')
+    save_demo_table(analytics_df, 'demo_analytics')
     
     print("✅ Demo files created:")
     print("   - demo_leads.csv (1000 leads)")
@@ -23,11 +23,13 @@ import sys
 import os
 # Robust import for ai_email_generator (handles Streamlit Cloud path issues)
 try:
-    from ai_email_generator import ai_email_generator
+    from ai_email_generator import get_ai_email_generator
+    ai_email_generator = get_ai_email_generator()
 except Exception:
     try:
         sys.path.append(os.path.dirname(__file__))
-        from ai_email_generator import ai_email_generator
+        from ai_email_generator import get_ai_email_generator
+        ai_email_generator = get_ai_email_generator()
     except Exception:
         # Minimal fallback to prevent runtime crash
         class _FallbackAIEmailGenerator:
@@ -4,12 +4,15 @@ Background Email Scheduler - Send emails when user is offline
 
 import threading
 import time
+import asyncio
+import heapq
 import json
+import orjson
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
 import uuid
-from email_sender import email_sender
+from email_sender import get_email_sender
 
 class EmailScheduler:
     def __init__(self):
@@ -17,21 +20,42 @@ class EmailScheduler:
         self.scheduled_emails = self.load_scheduled_emails()
         self.is_running = False
         self.scheduler_thread = None
+        
+        # Pending campaigns indexed by id and ordered by send time, so each
+        # tick only touches campaigns that are actually due. The condition
+        # wakes the scheduler thread when the schedule changes.
+        self._cv = threading.Condition()
+        self._by_id: Dict[str, Dict] = {}
+        self._pending_heap: List[tuple] = []
+        for campaign in self.scheduled_emails:
+            self._by_id[campaign['id']] = campaign
+            if campaign['status'] == 'scheduled':
+                self._pending_heap.append(
+                    (datetime.fromisoformat(campaign['send_time']), campaign['id'])
+                )
+        heapq.heapify(self._pending_heap)
     
     def load_scheduled_emails(self) -> List[Dict]:
         """Load scheduled emails from file"""
         if os.path.exists(self.scheduled_emails_file):
+            with open(self.scheduled_emails_file, 'rb') as f:
+                data = f.read()
             try:
-                with open(self.scheduled_emails_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # Files written by json.dump may contain NaN, which orjson
+                # rejects. Any other parse error propagates: returning [] here
+                # would let the next save wipe every pending schedule.
+                return json.loads(data)
         return []
     
     def save_scheduled_emails(self):
         """Save scheduled emails to file"""
-        with open(self.scheduled_emails_file, 'w', encoding='utf-8') as f:
-            json.dump(self.scheduled_emails, f, indent=2, ensure_ascii=False)
+        data = orjson.dumps(self.scheduled_emails, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        tmp_file = self.scheduled_emails_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, self.scheduled_emails_file)
     
     def schedule_campaign(self, campaign_name: str, recipients: List[Dict], 
                          subject: str, body: str, send_time: datetime, 
@@ -53,7 +77,11 @@ class EmailScheduler:
             'total_emails': len(recipients)
         }
         
-        self.scheduled_emails.append(scheduled_campaign)
+        with self._cv:
+            self.scheduled_emails.append(scheduled_campaign)
+            self._by_id[campaign_id] = scheduled_campaign
+            heapq.heappush(self._pending_heap, (send_time, campaign_id))
+            self._cv.notify()
         self.save_scheduled_emails()
         
         return campaign_id
@@ -68,31 +96,47 @@ class EmailScheduler:
     
     def stop_scheduler(self):
         """Stop the background email scheduler"""
-        self.is_running = False
+        with self._cv:
+            self.is_running = False
+            self._cv.notify()
         if self.scheduler_thread:
             self.scheduler_thread.join()
         print("📧 Email scheduler stopped")
     
+    def _pop_due_campaigns(self, current_time: datetime) -> List[Dict]:
+        """Pop every pending campaign whose send time has passed"""
+        due = []
+        with self._cv:
+            while self._pending_heap and self._pending_heap[0][0] <= current_time:
+                _, campaign_id = heapq.heappop(self._pending_heap)
+                campaign = self._by_id.get(campaign_id)
+                # Cancelled campaigns stay in the heap and are skipped here
+                if campaign and campaign['status'] == 'scheduled':
+                    due.append(campaign)
+        return due
+    
+    def _wait_for_next_campaign(self):
+        """Block until the next campaign is due or the schedule changes"""
+        with self._cv:
+            if not self.is_running:
+                return
+            timeout = None
+            if self._pending_heap:
+                timeout = max(0, (self._pending_heap[0][0] - datetime.now()).total_seconds())
+            self._cv.wait(timeout=timeout)
+    
     def _scheduler_loop(self):
         """Main scheduler loop - runs in background"""
         while self.is_running:
             try:
                 current_time = datetime.now()
                 
-                # Check for emails ready to send
-                emails_to_send = []
-                for email in self.scheduled_emails:
-                    if email['status'] == 'scheduled':
-                        send_time = datetime.fromisoformat(email['send_time'])
-                        if current_time >= send_time:
-                            emails_to_send.append(email)
-                
-                # Send scheduled emails
-                for email in emails_to_send:
+                # Send scheduled emails that are due
+                for email in self._pop_due_campaigns(current_time):
                     self._send_scheduled_campaign(email)
                 
-                # Sleep for 30 seconds before checking again
-                time.sleep(30)
+                # Sleep until the next campaign is due or a new one is scheduled
+                self._wait_for_next_campaign()
                 
             except Exception as e:
                 print(f"❌ Scheduler error: {e}")
@@ -106,14 +150,16 @@ class EmailScheduler:
             campaign_data['started_at'] = datetime.now().isoformat()
             self.save_scheduled_emails()
             
-            # Send emails
-            results = email_sender.send_bulk_emails(
+            # Send emails over a pool of SMTP connections; the campaign delay
+            # now paces each connection instead of serializing the whole send
+            results = asyncio.run(get_email_sender().send_bulk_emails_async(
                 recipients=campaign_data['recipients'],
                 subject=campaign_data['subject'],
                 body=campaign_data['body'],
                 campaign_id=campaign_data['id'],
+                concurrency=campaign_data.get('concurrency', 8),
                 delay_seconds=campaign_data['delay_seconds']
-            )
+            ))
             
             # Update status to completed
             successful = len([r for r in results if r['status'] == 'sent'])
@@ -142,27 +188,24 @@ class EmailScheduler:
     
     def get_campaign_status(self, campaign_id: str) -> Dict:
         """Get status of a specific campaign"""
-        for campaign in self.scheduled_emails:
-            if campaign['id'] == campaign_id:
-                return campaign
-        return {}
+        return self._by_id.get(campaign_id, {})
     
     def cancel_campaign(self, campaign_id: str) -> bool:
         """Cancel a scheduled campaign"""
-        for i, campaign in enumerate(self.scheduled_emails):
-            if campaign['id'] == campaign_id and campaign['status'] == 'scheduled':
-                self.scheduled_emails[i]['status'] = 'cancelled'
-                self.scheduled_emails[i]['cancelled_at'] = datetime.now().isoformat()
-                self.save_scheduled_emails()
-                return True
+        campaign = self._by_id.get(campaign_id)
+        if campaign and campaign['status'] == 'scheduled':
+            campaign['status'] = 'cancelled'
+            campaign['cancelled_at'] = datetime.now().isoformat()
+            self.save_scheduled_emails()
+            return True
         return False
     
     def get_next_send_time(self) -> str:
         """Get the next scheduled send time"""
-        scheduled_emails = [e for e in self.scheduled_emails if e['status'] == 'scheduled']
-        if scheduled_emails:
-            next_time = min([datetime.fromisoformat(e['send_time']) for e in scheduled_emails])
-            return next_time.strftime('%Y-%m-%d %H:%M:%S')
+        with self._cv:
+            for send_time, campaign_id in sorted(self._pending_heap):
+                if self._by_id[campaign_id]['status'] == 'scheduled':
+                    return send_time.strftime('%Y-%m-%d %H:%M:%S')
         return "No emails scheduled"
 
 # Global scheduler instance
@@ -4,22 +4,132 @@ Real Email Sending System with Tracking
 
 import smtplib
 import ssl
+import asyncio
+import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 import json
+import orjson
 import os
+import re
+import sqlite3
+import string
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 import uuid
 import time
 import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Stand-in for the email id in cached HTML bodies
+_EMAIL_ID_TOKEN = '\x00EMAIL_ID\x00'
+_LINK_RE = re.compile(r'href="([^"]*)"')
+
+# Stand-ins for the per-recipient fields in cached serialized messages
+_SKELETON_ID = '__LEADAI_EMAIL_ID__'
+_SKELETON_TO = '__LEADAI_RECIPIENT__'
+
+# Line-ending normalisation and dot-stuffing for pipelined DATA (RFC 5321)
+_EOL_RE = re.compile(r'\r\n|\n|\r')
+_LEADING_DOT_RE = re.compile(br'(?m)^\.')
+
+@lru_cache(maxsize=64)
+def _tracked_html_template(body: str) -> str:
+    """Build the tracked HTML body once per distinct body text"""
+    # Add tracking pixel (for open tracking)
+    # IMPORTANT: Streamlit handles query params at the root URL
+    tracking_pixel = f'<img src="http://localhost:8501/?track=open&email_id={_EMAIL_ID_TOKEN}" width="1" height="1" style="display:none; visibility:hidden;">'
+    
+    # Add click tracking to links
+    click_prefix = f'http://localhost:8501/?track=click&email_id={_EMAIL_ID_TOKEN}&url='
+    body_with_tracking = _LINK_RE.sub(lambda m: f'href="{click_prefix}{m.group(1)}"', body)
+    
+    return f"""
+        <html>
+        <body>
+            {body_with_tracking.replace(chr(10), '<br>')}
+            {tracking_pixel}
+        </body>
+        </html>
+        """
+
+# Fields available to subject/body templates
+_TEMPLATE_FIELDS = ('name', 'company', 'title')
+
+# Stand-ins for the template fields, so one cached skeleton serves every
+# recipient of a template
+_SKELETON_FIELDS = {field: f'__LEADAI_FIELD_{field.upper()}__' for field in _TEMPLATE_FIELDS}
+
+def _skeleton_safe(value: str) -> bool:
+    """Whether a value can be spliced into a serialized 7-bit message as-is"""
+    # Non-ASCII would change the transfer encoding, line breaks would need <br>
+    # in the HTML part, and quotes could alter how links are matched
+    return value.isascii() and '"' not in value and '\n' not in value and '\r' not in value
+
+@lru_cache(maxsize=64)
+def _parse_template(template: str) -> Optional[tuple]:
+    """Split a personalization template into (literal, field) pairs once
+    
+    Returns None when the template needs full ``str.format`` handling
+    (format specs, conversions, unknown fields or malformed braces).
+    """
+    try:
+        parts = tuple(string.Formatter().parse(template))
+    except ValueError:
+        return None
+    for _, field, spec, conversion in parts:
+        if field is not None and (field not in _TEMPLATE_FIELDS or spec or conversion):
+            return None
+    return tuple((literal, field) for literal, field, _, _ in parts)
+
+def personalize(template: str, recipient: Dict) -> str:
+    """Fill the name/company/title placeholders for one recipient"""
+    parts = _parse_template(template)
+    if parts is None:
+        return template.format(
+            name=recipient.get('name', ''),
+            company=recipient.get('company', ''),
+            title=recipient.get('title', '')
+        )
+    return ''.join(
+        literal if field is None else literal + str(recipient.get(field, ''))
+        for literal, field in parts
+    )
+
+class RateLimiter:
+    """Thread-safe token bucket shared by all senders in a bulk run"""
+    
+    def __init__(self, rate_per_sec: float, capacity: float = 1.0):
+        self.rate_per_sec = rate_per_sec
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate_per_sec)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate_per_sec
+            time.sleep(wait)
+
 class EmailSender:
+    # Recycle pooled SMTP sessions after this many messages
+    MESSAGES_PER_CONNECTION = 100
+    
     def __init__(self):
         self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
         self.smtp_port = int(os.getenv('SMTP_PORT', '587'))
@@ -27,34 +137,353 @@ class EmailSender:
         self.sender_password = os.getenv('SMTP_PASSWORD', '')
         self.sender_name = os.getenv('SENDER_NAME', 'LeadAI Pro')
         
-        # Email tracking database
+        # Email tracking database (SQLite in WAL mode, one row per email). The
+        # legacy JSON file is imported the first time the database is created.
         self.tracking_file = "email_tracking.json"
+        self.tracking_db = "email_tracking.db"
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(self.tracking_db, check_same_thread=False)
+        # Bumped on every change so callers can key caches on it; set before
+        # the legacy import, which goes through log_events
+        self._version = 0
+        # Guards email_logs, its indexes and _version, which bulk-send worker
+        # threads update while the UI thread reads them
+        self._logs_lock = threading.RLock()
+        self._init_tracking_db()
         self.email_logs = self.load_email_logs()
+        self._rebuild_indexes()
+        
+        # Persistent SMTP session shared across sends
+        self._smtp_lock = threading.Lock()
+        self._smtp = None
+        self._smtp_key = None
+        
+        # Serialized messages keyed by sender and unpersonalized subject/body,
+        # with placeholders for the recipient, email id and template fields.
+        # Shared by the bulk-send worker threads.
+        self._skeletons: Dict[tuple, Optional[str]] = {}
+        self._skeletons_lock = threading.Lock()
+        
+        # Per-thread sessions used by the bulk-send worker pool
+        self._worker_local = threading.local()
+        self._worker_sessions: List[smtplib.SMTP] = []
+        self._worker_sessions_lock = threading.Lock()
+    
+    def _init_tracking_db(self):
+        """Create the email_logs table and import the legacy JSON logs"""
+        with self._db_lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS email_logs (
+                    id TEXT PRIMARY KEY,
+                    campaign_id TEXT,
+                    recipient_email TEXT,
+                    status TEXT,
+                    sent_at TEXT,
+                    opened_at TEXT,
+                    clicked_at TEXT,
+                    payload BLOB
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_email_logs_campaign ON email_logs(campaign_id)')
+            migrated = self._conn.execute('PRAGMA user_version').fetchone()[0] > 0
+            self._conn.commit()
+        
+        if migrated:
+            return
+        try:
+            legacy_logs = []
+            if os.path.exists(self.tracking_file):
+                legacy_logs = self._read_legacy_logs(self.tracking_file)
+            # The imported rows and the migrated flag are committed together, so
+            # a failed import is retried on the next start
+            with self._db_lock:
+                try:
+                    self._upsert_logs(legacy_logs)
+                    self._conn.execute('PRAGMA user_version = 1')
+                    self._conn.commit()
+                except Exception:
+                    self._conn.rollback()
+                    raise
+        except Exception as e:
+            print(f"⚠️ Could not import {self.tracking_file}: {e}")
+    
+    @staticmethod
+    def _read_legacy_logs(path: str) -> List[Dict]:
+        """Parse the legacy JSON tracking file"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Files written by the old json.dump can contain NaN, which orjson
+            # rejects; the stdlib parser accepts it
+            return json.loads(data)
+    
+    @staticmethod
+    def _log_row(email_log: Dict) -> tuple:
+        """Flatten an email log into an email_logs row"""
+        return (
+            email_log['id'],
+            email_log.get('campaign_id'),
+            email_log.get('recipient_email'),
+            email_log.get('status'),
+            email_log.get('sent_at'),
+            email_log.get('opened_at'),
+            email_log.get('clicked_at'),
+            orjson.dumps(email_log, option=orjson.OPT_NON_STR_KEYS),
+        )
+    
+    def log_event(self, email_log: Dict):
+        """Insert or update a single email log"""
+        self.log_events([email_log])
+    
+    def log_events(self, email_logs: List[Dict]):
+        """Insert or update several email logs in one transaction"""
+        with self._logs_lock:
+            self._version += 1
+        with self._db_lock:
+            self._upsert_logs(email_logs)
+            self._conn.commit()
+    
+    def _upsert_logs(self, email_logs: List[Dict]):
+        """Write email logs without committing; the caller holds _db_lock"""
+        self._conn.executemany(
+                '''
+                INSERT INTO email_logs VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    campaign_id = excluded.campaign_id,
+                    recipient_email = excluded.recipient_email,
+                    status = excluded.status,
+                    sent_at = excluded.sent_at,
+                    opened_at = excluded.opened_at,
+                    clicked_at = excluded.clicked_at,
+                    payload = excluded.payload
+                ''',
+                [self._log_row(log) for log in email_logs]
+            )
     
     def load_email_logs(self) -> List[Dict]:
         """Load email tracking logs"""
-        if os.path.exists(self.tracking_file):
-            try:
-                with open(self.tracking_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+        with self._db_lock:
+            rows = self._conn.execute('SELECT payload FROM email_logs ORDER BY rowid').fetchall()
+        return [orjson.loads(payload) for (payload,) in rows]
+    
+    def _rebuild_indexes(self):
+        """Index the in-memory logs by id, campaign and status"""
+        with self._logs_lock:
+            # Bump even when the logs were emptied and nothing is indexed
+            self._version += 1
+            self._log_index: Dict[str, Dict] = {}
+            self._by_campaign: Dict[str, List[Dict]] = defaultdict(list)
+            self._by_status: Dict[str, List[Dict]] = defaultdict(list)
+            for log in self.email_logs:
+                self._index_log(log)
+    
+    def _index_log(self, email_log: Dict):
+        """Add a log to the lookup indexes (caller holds _logs_lock)"""
+        self._version += 1
+        self._log_index[email_log['id']] = email_log
+        self._by_campaign[email_log.get('campaign_id')].append(email_log)
+        self._by_status[email_log['status']].append(email_log)
+    
+    def _add_log(self, email_log: Dict):
+        """Append a log to the in-memory logs and index it"""
+        with self._logs_lock:
+            self.email_logs.append(email_log)
+            self._index_log(email_log)
     
     def save_email_logs(self):
-        """Save email tracking logs"""
-        with open(self.tracking_file, 'w', encoding='utf-8') as f:
-            json.dump(self.email_logs, f, indent=2, ensure_ascii=False)
+        """Rewrite the tracking database from the in-memory logs"""
+        # email_logs may have been reassigned by the caller
+        self._rebuild_indexes()
+        with self._db_lock:
+            self._conn.execute('DELETE FROM email_logs')
+            self._conn.executemany(
+                'INSERT INTO email_logs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [self._log_row(log) for log in self.email_logs]
+            )
+            self._conn.commit()
     
     def send_email(self, recipient_email: str, recipient_name: str, subject: str, 
-                   body: str, campaign_id: str = None) -> Dict[str, Any]:
-        """Send a single email with tracking"""
+                   body: str, campaign_id: str = None, defer_save: bool = False,
+                   personalized_from: Optional[tuple] = None) -> Dict[str, Any]:
+        """Send a single email with tracking
+        
+        With ``defer_save`` the log is only kept in memory; the caller is
+        responsible for writing it with ``log_events``. ``personalized_from``
+        is the ``(subject_template, body_template, recipient)`` the subject and
+        body were filled from, which lets the serialized message be shared.
+        """
+        
+        email_log = self._new_email_log(recipient_email, recipient_name, subject, body, campaign_id)
         
+        try:
+            message = self._render_message(email_log['id'], recipient_email, subject, body, personalized_from)
+            
+            self._deliver(recipient_email, message)
+            
+            # Update status
+            now_iso = datetime.now().isoformat()
+            email_log['status'] = 'sent'
+            email_log['sent_at'] = now_iso
+            email_log['updated_at'] = now_iso
+            
+        except Exception as e:
+            # Update status with error
+            email_log['status'] = 'failed'
+            email_log['error_message'] = str(e)
+            email_log['updated_at'] = datetime.now().isoformat()
+        
+        # Save to logs
+        self._add_log(email_log)
+        if not defer_save:
+            self.log_event(email_log)
+        
+        return email_log
+    
+    def _deliver(self, recipient_email: str, message: str):
+        """Send a serialized message, reconnecting once if the server dropped
+        the session between the health check and the send"""
+        if getattr(self._worker_local, 'pooled', False):
+            # Bulk-send worker thread: use this thread's own session
+            try:
+                self._sendmail(self._get_worker_smtp(), recipient_email, message)
+            except smtplib.SMTPServerDisconnected:
+                self._worker_local.smtp = None
+                self._sendmail(self._get_worker_smtp(), recipient_email, message)
+            self._worker_local.sent += 1
+            return
+        
+        with self._smtp_lock:
+            try:
+                self._sendmail(self._get_smtp(), recipient_email, message)
+            except smtplib.SMTPServerDisconnected:
+                self._close_smtp()
+                self._sendmail(self._get_smtp(), recipient_email, message)
+    
+    def _sendmail(self, server: smtplib.SMTP, recipient_email: str, message: str):
+        """Send one message, pipelining MAIL/RCPT/DATA when the server allows it
+        
+        With PIPELINING (RFC 2920) the three envelope commands go out in one
+        write and their replies are read together, so a message costs two
+        round trips instead of four. Other servers get plain ``sendmail``.
+        """
+        if not (server.has_extn('pipelining') and recipient_email.isascii() and message.isascii()):
+            server.sendmail(self.sender_email, recipient_email, message)
+            return
+        
+        data = _EOL_RE.sub('\r\n', message).encode('ascii')
+        size = f' SIZE={len(data)}' if server.has_extn('size') else ''
+        server.send(
+            f'MAIL FROM:{smtplib.quoteaddr(self.sender_email)}{size}\r\n'
+            f'RCPT TO:{smtplib.quoteaddr(recipient_email)}\r\n'
+            'DATA\r\n'
+        )
+        (mail_code, mail_resp), (rcpt_code, rcpt_resp), (data_code, data_resp) = (
+            server.getreply(), server.getreply(), server.getreply()
+        )
+        
+        if mail_code != 250 or rcpt_code not in (250, 251) or data_code != 354:
+            if data_code == 354:
+                # Server accepted DATA anyway; end the empty message
+                server.send(b'.\r\n')
+                server.getreply()
+            server.rset()
+            if mail_code != 250:
+                raise smtplib.SMTPSenderRefused(mail_code, mail_resp, self.sender_email)
+            if rcpt_code not in (250, 251):
+                raise smtplib.SMTPRecipientsRefused({recipient_email: (rcpt_code, rcpt_resp)})
+            raise smtplib.SMTPDataError(data_code, data_resp)
+        
+        data = _LEADING_DOT_RE.sub(b'..', data)
+        if not data.endswith(b'\r\n'):
+            data += b'\r\n'
+        server.send(data + b'.\r\n')
+        code, resp = server.getreply()
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+    
+    def _open_smtp(self) -> smtplib.SMTP:
+        """Open an authenticated SMTP session"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls(context=ssl.create_default_context())
+        server.login(self.sender_email, self.sender_password)
+        return server
+    
+    def _get_worker_smtp(self) -> smtplib.SMTP:
+        """Return the calling worker thread's session, recycling it every
+        MESSAGES_PER_CONNECTION messages"""
+        local = self._worker_local
+        if local.smtp is not None and local.sent >= self.MESSAGES_PER_CONNECTION:
+            self._quit_quietly(local.smtp)
+            local.smtp = None
+        if local.smtp is None:
+            local.smtp = self._open_smtp()
+            local.sent = 0
+            with self._worker_sessions_lock:
+                self._worker_sessions.append(local.smtp)
+        return local.smtp
+    
+    @staticmethod
+    def _quit_quietly(server: smtplib.SMTP):
+        """QUIT a session, falling back to closing the socket"""
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+    
+    def _init_worker(self):
+        """Mark a bulk-send pool thread so _deliver uses a per-thread session"""
+        self._worker_local.pooled = True
+        self._worker_local.smtp = None
+        self._worker_local.sent = 0
+    
+    def _close_worker_sessions(self):
+        """Close every session opened by bulk-send pool threads"""
+        with self._worker_sessions_lock:
+            sessions, self._worker_sessions = self._worker_sessions, []
+        for server in sessions:
+            self._quit_quietly(server)
+    
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Return a live, authenticated SMTP session (caller holds _smtp_lock)"""
+        key = (self.smtp_server, self.smtp_port, self.sender_email, self.sender_password)
+        if self._smtp is not None and self._smtp_key == key:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+        
+        # Credentials changed or the session went stale: reconnect
+        self._close_smtp()
+        server = self._open_smtp()
+        self._smtp = server
+        self._smtp_key = key
+        return server
+    
+    def _close_smtp(self):
+        """Close the shared SMTP session (caller holds _smtp_lock)"""
+        if self._smtp is not None:
+            self._quit_quietly(self._smtp)
+            self._smtp = None
+            self._smtp_key = None
+    
+    def close(self):
+        """Close the persistent SMTP session"""
+        with self._smtp_lock:
+            self._close_smtp()
+    
+    def _new_email_log(self, recipient_email: str, recipient_name: str, subject: str,
+                       body: str, campaign_id: str = None) -> Dict[str, Any]:
+        """Create a pending email log entry"""
         email_id = str(uuid.uuid4())
         timestamp = datetime.now().isoformat()
         
-        # Create email log entry
-        email_log = {
+        return {
             'id': email_id,
             'campaign_id': campaign_id,
             'recipient_email': recipient_email,
@@ -74,125 +503,152 @@ class EmailSender:
             'created_at': timestamp,
             'updated_at': timestamp
         }
+    
+    def _build_message(self, email_id: str, recipient_email: str, subject: str, body: str) -> MIMEMultipart:
+        """Build the MIME message with open and click tracking"""
+        message = MIMEMultipart("alternative")
+        message["Subject"] = subject
+        message["From"] = f"{self.sender_name} <{self.sender_email}>"
+        message["To"] = recipient_email
+        
+        # Create HTML version with tracking
+        html_body = _tracked_html_template(body).replace(_EMAIL_ID_TOKEN, email_id)
+        
+        # Create text version
+        text_part = MIMEText(body, "plain")
+        html_part = MIMEText(html_body, "html")
+        
+        message.attach(text_part)
+        message.attach(html_part)
+        
+        return message
+    
+    def _render_message(self, email_id: str, recipient_email: str, subject: str, body: str,
+                        personalized_from: Optional[tuple] = None) -> str:
+        """Serialize a message, reusing the cached skeleton for its template"""
+        skeleton_subject, skeleton_body, values = subject, body, {}
+        if personalized_from is not None:
+            subject_template, body_template, recipient = personalized_from
+            field_values = {field: str(recipient.get(field, '')) for field in _TEMPLATE_FIELDS}
+            # Only plain {field} templates; format specs would apply to the stand-ins
+            if (_parse_template(subject_template) is not None
+                    and _parse_template(body_template) is not None
+                    and all(_skeleton_safe(value) for value in field_values.values())):
+                skeleton_subject = personalize(subject_template, _SKELETON_FIELDS)
+                skeleton_body = personalize(body_template, _SKELETON_FIELDS)
+                values = {_SKELETON_FIELDS[field]: value for field, value in field_values.items()}
+        
+        skeleton = self._message_skeleton(skeleton_subject, skeleton_body) if recipient_email.isascii() else None
+        if skeleton is None:
+            return self._build_message(email_id, recipient_email, subject, body).as_string()
+        for token, value in values.items():
+            skeleton = skeleton.replace(token, value)
+        return skeleton.replace(_SKELETON_TO, recipient_email).replace(_SKELETON_ID, email_id)
+    
+    def _message_skeleton(self, subject: str, body: str) -> Optional[str]:
+        """Serialized message with placeholder recipient, email id and fields"""
+        key = (self.sender_name, self.sender_email, subject, body)
+        with self._skeletons_lock:
+            if key in self._skeletons:
+                return self._skeletons[key]
         
+        skeleton = None
+        # Non-ASCII text is base64- or RFC 2047-encoded, which hides the placeholders
+        if subject.isascii() and body.isascii():
+            skeleton = self._build_message(_SKELETON_ID, _SKELETON_TO, subject, body).as_string()
+            if _SKELETON_ID not in skeleton or _SKELETON_TO not in skeleton:
+                skeleton = None
+        with self._skeletons_lock:
+            if len(self._skeletons) >= 64:
+                self._skeletons.clear()
+            self._skeletons[key] = skeleton
+        return skeleton
+    
+    def send_bulk_emails_generator(self, recipients: List[Dict], subject: str, body: str, 
+                                 campaign_id: str = None, delay_seconds: int = 20, 
+                                 subject_b: str = None, concurrency: int = 5,
+                                 batch_size: int = 1):
+        """Generator that sends bulk emails and yields results as they complete (Supports A/B testing)
+        
+        Each worker thread keeps its own long-lived SMTP session. With a
+        ``delay_seconds`` rate limit, a token bucket lets ``batch_size`` emails
+        out per ``delay_seconds`` and the pool holds ``batch_size`` workers, so
+        no session sits idle; with no delay, ``concurrency`` workers send
+        back to back. Logs are written to the tracking database in one batch
+        when the generator exits.
+        """
+        batch_size = max(1, batch_size)
+        if delay_seconds > 0:
+            rate_limiter = RateLimiter(batch_size / delay_seconds, capacity=batch_size)
+            workers = batch_size
+        else:
+            rate_limiter = None
+            workers = max(1, concurrency)
+        executor = ThreadPoolExecutor(max_workers=workers, initializer=self._init_worker)
+        futures = []
         try:
-            # Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = subject
-            message["From"] = f"{self.sender_name} <{self.sender_email}>"
-            message["To"] = recipient_email
-            
-            # Add tracking pixel (for open tracking)
-            # IMPORTANT: Streamlit handles query params at the root URL
-            tracking_pixel = f'<img src="http://localhost:8501/?track=open&email_id={email_id}" width="1" height="1" style="display:none; visibility:hidden;">'
-            
-            # Add click tracking to links
-            body_with_tracking = body.replace('href="', f'href="http://localhost:8501/?track=click&email_id={email_id}&url=')
-            
-            # Create HTML version with tracking
-            html_body = f"""
-            <html>
-            <body>
-                {body_with_tracking.replace(chr(10), '<br>')}
-                {tracking_pixel}
-            </body>
-            </html>
-            """
-            
-            # Create text version
-            text_part = MIMEText(body, "plain")
-            html_part = MIMEText(html_body, "html")
+            futures = [
+                executor.submit(self._send_to_recipient, i, recipient, subject, body,
+                                campaign_id, subject_b, rate_limiter)
+                for i, recipient in enumerate(recipients)
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._close_worker_sessions()
+            self.log_events([f.result() for f in futures if f.done() and not f.cancelled()])
+    
+    def _send_to_recipient(self, i: int, recipient: Dict, subject: str, body: str,
+                           campaign_id: str, subject_b: str,
+                           rate_limiter: Optional[RateLimiter] = None) -> Dict:
+        """Personalize and send one bulk email, returning its log"""
+        try:
+            # Select subject (Alternate A/B if subject_b is provided)
+            current_subject = subject
+            variant = "A"
+            if subject_b and i % 2 != 0:
+                current_subject = subject_b
+                variant = "B"
             
-            message.attach(text_part)
-            message.attach(html_part)
+            # Personalize email content
+            personalized_subject = personalize(current_subject, recipient)
+            personalized_body = personalize(body, recipient)
             
             # Send email
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, recipient_email, message.as_string())
+            if rate_limiter:
+                rate_limiter.acquire()
+            result = self.send_email(
+                recipient_email=recipient.get('email', ''),
+                recipient_name=recipient.get('name', ''),
+                subject=personalized_subject,
+                body=personalized_body,
+                campaign_id=campaign_id,
+                defer_save=True,
+                personalized_from=(current_subject, body, recipient)
+            )
             
-            # Update status
-            email_log['status'] = 'sent'
-            email_log['sent_at'] = datetime.now().isoformat()
-            email_log['updated_at'] = datetime.now().isoformat()
+            # Tag result with variant
+            result['ab_variant'] = variant
             
         except Exception as e:
-            # Update status with error
-            email_log['status'] = 'failed'
-            email_log['error_message'] = str(e)
-            email_log['updated_at'] = datetime.now().isoformat()
-        
-        # Save to logs
-        self.email_logs.append(email_log)
-        self.save_email_logs()
+            # Log error for this recipient
+            now_iso = datetime.now().isoformat()
+            result = {
+                'id': str(uuid.uuid4()),
+                'campaign_id': campaign_id,
+                'recipient_email': recipient.get('email', ''),
+                'recipient_name': recipient.get('name', ''),
+                'subject': subject,
+                'body': body,
+                'status': 'failed',
+                'error_message': str(e),
+                'created_at': now_iso,
+                'updated_at': now_iso
+            }
+            self._add_log(result)
         
-        return email_log
-    
-    def send_bulk_emails_generator(self, recipients: List[Dict], subject: str, body: str, 
-                                 campaign_id: str = None, delay_seconds: int = 20, 
-                                 subject_b: str = None):
-        """Generator that sends bulk emails and yields results one by one (Supports A/B testing)"""
-        for i, recipient in enumerate(recipients):
-            try:
-                # Select subject (Alternate A/B if subject_b is provided)
-                current_subject = subject
-                variant = "A"
-                if subject_b and i % 2 != 0:
-                    current_subject = subject_b
-                    variant = "B"
-                
-                # Personalize email content
-                personalized_subject = current_subject.format(
-                    name=recipient.get('name', ''),
-                    company=recipient.get('company', ''),
-                    title=recipient.get('title', '')
-                )
-                
-                personalized_body = body.format(
-                    name=recipient.get('name', ''),
-                    company=recipient.get('company', ''),
-                    title=recipient.get('title', '')
-                )
-                
-                # Send email
-                result = self.send_email(
-                    recipient_email=recipient.get('email', ''),
-                    recipient_name=recipient.get('name', ''),
-                    subject=personalized_subject,
-                    body=personalized_body,
-                    campaign_id=campaign_id
-                )
-                
-                # Tag result with variant
-                result['ab_variant'] = variant
-                
-                yield result
-                
-                # Add randomized delay between emails (except for last email)
-                if i < len(recipients) - 1:
-                    import random
-                    # Enhanced Anti-Spam: Add more variance
-                    actual_delay = delay_seconds + random.randint(-5, 10) if delay_seconds > 10 else delay_seconds + random.randint(-2, 3)
-                    time.sleep(max(1, actual_delay))
-                    
-            except Exception as e:
-                # Log error for this recipient
-                error_log = {
-                    'id': str(uuid.uuid4()),
-                    'campaign_id': campaign_id,
-                    'recipient_email': recipient.get('email', ''),
-                    'recipient_name': recipient.get('name', ''),
-                    'subject': subject,
-                    'body': body,
-                    'status': 'failed',
-                    'error_message': str(e),
-                    'created_at': datetime.now().isoformat(),
-                    'updated_at': datetime.now().isoformat()
-                }
-                self.email_logs.append(error_log)
-                yield error_log
+        return result
 
     def send_bulk_emails(self, recipients: List[Dict], subject: str, body: str, 
                         campaign_id: str = None, delay_seconds: int = 20) -> List[Dict]:
@@ -201,45 +657,125 @@ class EmailSender:
         for result in self.send_bulk_emails_generator(recipients, subject, body, campaign_id, delay_seconds):
             results.append(result)
         
-        self.save_email_logs()
         return results
     
+    async def send_bulk_emails_async(self, recipients: List[Dict], subject: str, body: str,
+                                     campaign_id: str = None, concurrency: int = 8,
+                                     delay_seconds: float = 0) -> List[Dict]:
+        """Send bulk emails over a pool of persistent SMTP connections
+        
+        Each of the ``concurrency`` workers keeps one authenticated session open
+        and sends its share of the recipients over it. ``delay_seconds`` is an
+        optional pause between messages on the same connection.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        results = []
+        
+        for recipient in recipients:
+            email_log = self._new_email_log(
+                recipient.get('email', ''), recipient.get('name', ''), subject, body, campaign_id
+            )
+            try:
+                email_log['subject'] = personalize(subject, recipient)
+                email_log['body'] = personalize(body, recipient)
+                queue.put_nowait((email_log, recipient))
+            except Exception as e:
+                email_log['status'] = 'failed'
+                email_log['error_message'] = str(e)
+            results.append(email_log)
+        
+        async def worker():
+            smtp = None
+            while not queue.empty():
+                email_log, recipient = queue.get_nowait()
+                try:
+                    message = self._render_message(
+                        email_log['id'], email_log['recipient_email'], email_log['subject'], email_log['body'],
+                        (subject, body, recipient)
+                    )
+                    if smtp is None:
+                        smtp = await self._open_async_smtp()
+                    await smtp.sendmail(self.sender_email, [email_log['recipient_email']], message)
+                    email_log['status'] = 'sent'
+                except Exception as e:
+                    email_log['status'] = 'failed'
+                    email_log['error_message'] = str(e)
+                    # Drop the session; the next message reconnects
+                    if smtp is not None:
+                        smtp.close()
+                        smtp = None
+                now_iso = datetime.now().isoformat()
+                email_log['updated_at'] = now_iso
+                if email_log['status'] == 'sent':
+                    email_log['sent_at'] = now_iso
+                
+                if delay_seconds and not queue.empty():
+                    await asyncio.sleep(delay_seconds)
+            
+            if smtp is not None:
+                try:
+                    await smtp.quit()
+                except Exception:
+                    smtp.close()
+        
+        await asyncio.gather(*[worker() for _ in range(max(1, min(concurrency, queue.qsize())))])
+        
+        for email_log in results:
+            self._add_log(email_log)
+        self.log_events(results)
+        return results
+    
+    async def _open_async_smtp(self) -> aiosmtplib.SMTP:
+        """Open an authenticated asyncio SMTP session"""
+        smtp = aiosmtplib.SMTP(hostname=self.smtp_server, port=self.smtp_port, start_tls=False)
+        await smtp.connect()
+        await smtp.starttls(tls_context=ssl.create_default_context())
+        await smtp.login(self.sender_email, self.sender_password)
+        return smtp
+    
     def get_email_status(self, email_id: str) -> Optional[Dict]:
         """Get status of a specific email"""
-        for log in self.email_logs:
-            if log['id'] == email_id:
-                return log
-        return None
+        return self._log_index.get(email_id)
     
-    def update_email_status(self, email_id: str, status: str, additional_data: Dict = None):
+    def update_email_status(self, email_id: str, status: str, additional_data: Dict = None,
+                            now_iso: str = None):
         """Update email status (for tracking)"""
-        for log in self.email_logs:
-            if log['id'] == email_id:
-                log['status'] = status
-                log['updated_at'] = datetime.now().isoformat()
-                
-                if additional_data:
-                    log.update(additional_data)
-                
-                self.save_email_logs()
-                break
+        log = self._log_index.get(email_id)
+        if log is None:
+            return
+        
+        with self._logs_lock:
+            old_status = log['status']
+            log['status'] = status
+            log['updated_at'] = now_iso or datetime.now().isoformat()
+            
+            if additional_data:
+                log.update(additional_data)
+            
+            if log['status'] != old_status:
+                self._by_status[old_status].remove(log)
+                self._by_status[log['status']].append(log)
+        
+        self.log_event(log)
     
     def track_email_open(self, email_id: str):
         """Track email open"""
+        now_iso = datetime.now().isoformat()
         self.update_email_status(email_id, 'opened', {
-            'opened_at': datetime.now().isoformat()
-        })
+            'opened_at': now_iso
+        }, now_iso)
     
     def track_email_click(self, email_id: str, url: str):
         """Track email click"""
+        now_iso = datetime.now().isoformat()
         self.update_email_status(email_id, 'clicked', {
-            'clicked_at': datetime.now().isoformat(),
+            'clicked_at': now_iso,
             'clicked_url': url
-        })
+        }, now_iso)
     
     def get_campaign_stats(self, campaign_id: str) -> Dict:
         """Get statistics for a campaign"""
-        campaign_emails = [log for log in self.email_logs if log.get('campaign_id') == campaign_id]
+        campaign_emails = self._by_campaign.get(campaign_id, [])
         
         if not campaign_emails:
             return {
@@ -256,13 +792,35 @@ class EmailSender:
                 'reply_rate': 0
             }
         
-        total_sent = len(campaign_emails)
-        delivered = len([e for e in campaign_emails if e['status'] in ['sent', 'opened', 'clicked', 'replied']])
-        opened = len([e for e in campaign_emails if e['status'] in ['opened', 'clicked', 'replied']])
-        clicked = len([e for e in campaign_emails if e['status'] in ['clicked', 'replied']])
-        replied = len([e for e in campaign_emails if e['status'] == 'replied'])
-        bounced = len([e for e in campaign_emails if e['status'] == 'bounced'])
-        failed = len([e for e in campaign_emails if e['status'] == 'failed'])
+        return self._campaign_stats(Counter(e['status'] for e in campaign_emails), len(campaign_emails))
+    
+    def get_campaign_stats_bulk(self, campaign_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """get_campaign_stats() for many campaigns (default: all of them), keyed by
+        campaign ID, from a single pass over the email logs"""
+        wanted = None if campaign_ids is None else set(campaign_ids)
+        counts: Dict[str, Counter] = defaultdict(Counter)
+        for log in self.email_logs:
+            campaign_id = log.get('campaign_id')
+            if campaign_id and (wanted is None or campaign_id in wanted):
+                counts[campaign_id][log['status']] += 1
+        if wanted is not None:
+            # Campaigns without logs get the same all-zero stats as get_campaign_stats()
+            for campaign_id in wanted.difference(counts):
+                counts[campaign_id] = Counter()
+        return {
+            campaign_id: self._campaign_stats(status_counts, sum(status_counts.values()))
+            for campaign_id, status_counts in counts.items()
+        }
+    
+    @staticmethod
+    def _campaign_stats(counts: Counter, total_sent: int) -> Dict:
+        """Campaign totals and rates from per-status log counts"""
+        replied = counts['replied']
+        clicked = counts['clicked'] + replied
+        opened = counts['opened'] + clicked
+        delivered = counts['sent'] + opened
+        bounced = counts['bounced']
+        failed = counts['failed']
         
         return {
             'total_sent': total_sent,
@@ -282,18 +840,38 @@ class EmailSender:
         """Get all email logs"""
         return self.email_logs
     
+    def get_campaign_ids(self) -> List[str]:
+        """IDs of all campaigns that have at least one email log"""
+        with self._logs_lock:
+            return [campaign_id for campaign_id, logs in self._by_campaign.items() if campaign_id and logs]
+    
+    def version(self) -> int:
+        """Change counter, incremented whenever a log is added, updated or deleted"""
+        return self._version
+    
     def get_emails_by_status(self, status: str) -> List[Dict]:
         """Get emails by status"""
-        return [log for log in self.email_logs if log['status'] == status]
+        return list(self._by_status.get(status, []))
     
     def delete_email_log(self, email_id: str) -> bool:
         """Delete an email log"""
-        for i, log in enumerate(self.email_logs):
-            if log['id'] == email_id:
-                del self.email_logs[i]
-                self.save_email_logs()
-                return True
-        return False
+        with self._logs_lock:
+            log = self._log_index.pop(email_id, None)
+            if log is None:
+                return False
+            
+            self.email_logs.remove(log)
+            self._version += 1
+            self._by_campaign[log.get('campaign_id')].remove(log)
+            self._by_status[log['status']].remove(log)
+        with self._db_lock:
+            self._conn.execute('DELETE FROM email_logs WHERE id = ?', (email_id,))
+            self._conn.commit()
+        return True
 
-# Global email sender instance
-email_sender = EmailSender()
+# Global email sender instance, created on first use so importing this module
+# does no database or file I/O
+@lru_cache(maxsize=1)
+def get_email_sender() -> EmailSender:
+    """Return the shared EmailSender"""
+    return EmailSender()
@@ -3,36 +3,198 @@ Lead Database Management System
 Stores and manages leads with advanced features
 """
 
-import pandas as pd
+import csv
 import json
 import os
+import atexit
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from functools import lru_cache
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import uuid
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _dump_line(record: Dict) -> bytes:
+    """Serialize one record as a UTF-8 JSONL line"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _load_json(data: bytes) -> Any:
+    """Parse UTF-8 JSON bytes"""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN, as written by json.dumps, is rejected by orjson; retry with
+            # the stdlib parser before treating the data as corrupt
+            pass
+    return json.loads(data)
+
+
 class LeadDatabase:
-    def __init__(self, db_file: str = "leads_database.json"):
+    # Seconds to wait before writing pending changes to disk
+    FLUSH_INTERVAL = 5.0
+    
+    def __init__(self, db_file: str = "leads_database.jsonl"):
+        # The database is an append-only JSONL log: one line per lead snapshot
+        # or {'id': ..., '_deleted': True} tombstone, replayed by id on load.
+        # The old single-document JSON file is imported on first run.
         self.db_file = db_file
+        self.legacy_file = os.path.splitext(db_file)[0] + '.json'
+        
+        # Writes only queue records; a timer (and interpreter exit) appends
+        # them to the file instead of rewriting it after every operation.
+        self._lock = threading.RLock()
+        self._pending: Dict[str, Dict] = {}
+        self._line_count = 0
+        self._flush_timer = None
+        # Bumped on every change so callers can key caches on it
+        self._version = 0
+        
         self.leads = self.load_leads()
+        
+        # Lookup indexes: by id, by status, and (score, id) pairs kept sorted
+        # in two parallel lists so score ranges are found with bisect.
+        self._lead_index: Dict[str, Dict] = {}
+        self._by_status: Dict[str, List[Dict]] = defaultdict(list)
+        self._scores: List[float] = []
+        self._score_ids: List[str] = []
+        self._search_blobs: Dict[str, str] = {}
+        # Insertion sequence per lead id, so index lookups can be returned in
+        # the same order as self.leads
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+        for lead in self.leads:
+            self._assign_order(lead['id'])
+            self._index_lead(lead)
+        if self.leads and not os.path.exists(self.db_file):
+            self.save_leads()
+        atexit.register(self.flush)
     
     def load_leads(self) -> List[Dict]:
         """Load leads from database file"""
+        self._line_count = 0
         if os.path.exists(self.db_file):
-            try:
-                with open(self.db_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
+            leads = {}
+            with open(self.db_file, 'rb') as f:
+                for line in f:
+                    try:
+                        record = _load_json(line)
+                    except ValueError:
+                        # Blank line or a write torn by a crash
+                        continue
+                    self._line_count += 1
+                    if record.get('_deleted'):
+                        leads.pop(record['id'], None)
+                    else:
+                        leads[record['id']] = record
+            return list(leads.values())
+        if os.path.exists(self.legacy_file):
+            # One-time import of the old single-document file, which json.dump
+            # wrote with NaN for missing values. Errors propagate: returning an
+            # empty list here would create the JSONL file and skip the import
+            # for good.
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
         return []
     
     def save_leads(self):
-        """Save leads to database file"""
-        with open(self.db_file, 'w', encoding='utf-8') as f:
-            json.dump(self.leads, f, indent=2, ensure_ascii=False)
+        """Rewrite the database file with one line per current lead"""
+        with self._lock:
+            tmp_file = self.db_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.writelines(_dump_line(lead) for lead in self.leads)
+            os.replace(tmp_file, self.db_file)
+            self._line_count = len(self.leads)
+            self._pending.clear()
+    
+    def compact(self):
+        """Rewrite the file once superseded records outnumber live leads"""
+        with self._lock:
+            if self._line_count > 2 * len(self.leads):
+                self.save_leads()
+    
+    def _assign_order(self, lead_id: str):
+        """Record a lead's position in insertion order"""
+        self._order[lead_id] = self._next_order
+        self._next_order += 1
+    
+    def _in_insertion_order(self, leads: List[Dict]) -> List[Dict]:
+        """Sort index matches back into the order of self.leads"""
+        order = self._order
+        return sorted(leads, key=lambda lead: order[lead['id']])
+    
+    def _index_lead(self, lead: Dict):
+        """Add a lead to the lookup indexes"""
+        self._lead_index[lead['id']] = lead
+        self._by_status[lead['status']].append(lead)
+        i = bisect_right(self._scores, lead['score'])
+        self._scores.insert(i, lead['score'])
+        self._score_ids.insert(i, lead['id'])
+        self._search_blobs[lead['id']] = self._search_blob(lead)
+    
+    @staticmethod
+    def _search_blob(lead: Dict) -> str:
+        """Lowercased name/email/company, NUL-separated so matches stay within a field"""
+        # Ensure all fields are strings before calling .lower()
+        return '\0'.join(
+            str(lead[field]) if lead.get(field) is not None else ''
+            for field in ('name', 'email', 'company')
+        ).lower()
+    
+    def _unindex_lead(self, lead: Dict):
+        """Remove a lead from the status, score and search indexes"""
+        self._by_status[lead['status']].remove(lead)
+        lo = bisect_left(self._scores, lead['score'])
+        hi = bisect_right(self._scores, lead['score'])
+        i = self._score_ids.index(lead['id'], lo, hi)
+        del self._scores[i]
+        del self._score_ids[i]
+        self._search_blobs.pop(lead['id'], None)
+    
+    def _mark_dirty(self, lead_id: str, record: Dict):
+        """Queue a lead record and schedule a flush"""
+        with self._lock:
+            self._pending[lead_id] = record
+            self._version += 1
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.FLUSH_INTERVAL, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def flush(self):
+        """Write pending changes to disk now"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._pending:
+                with open(self.db_file, 'ab') as f:
+                    f.writelines(_dump_line(record) for record in self._pending.values())
+                self._line_count += len(self._pending)
+                self._pending.clear()
+            self.compact()
     
     def add_lead(self, lead_data: Dict) -> str:
         """Add a new lead to database"""
+        with self._lock:
+            lead_id = self._insert_lead(lead_data)
+        return lead_id
+    
+    def _insert_lead(self, lead_data: Dict, now_iso: str = None) -> str:
+        """Build a lead record and add it to the in-memory database"""
         lead_id = str(uuid.uuid4())
+        now_iso = now_iso or datetime.now().isoformat()
         lead = {
             'id': lead_id,
             'name': lead_data.get('name', ''),
@@ -47,8 +209,8 @@ class LeadDatabase:
             'status': lead_data.get('status', 'New'),
             'tags': lead_data.get('tags', []),
             'notes': lead_data.get('notes', ''),
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat(),
+            'created_at': now_iso,
+            'updated_at': now_iso,
             'last_contact': None,
             'email_sent': 0,
             'email_opened': 0,
@@ -56,31 +218,37 @@ class LeadDatabase:
             'converted': False
         }
         self.leads.append(lead)
-        self.save_leads()
+        self._assign_order(lead_id)
+        self._index_lead(lead)
+        self._mark_dirty(lead_id, lead)
         return lead_id
     
     def add_leads_bulk(self, leads_data: List[Dict]) -> List[str]:
         """Add multiple leads from CSV upload"""
-        lead_ids = []
-        for lead_data in leads_data:
-            lead_id = self.add_lead(lead_data)
-            lead_ids.append(lead_id)
+        # One timestamp for the whole upload
+        now_iso = datetime.now().isoformat()
+        with self._lock:
+            lead_ids = [self._insert_lead(lead_data, now_iso) for lead_data in leads_data]
         return lead_ids
     
     def get_lead(self, lead_id: str) -> Optional[Dict]:
         """Get a specific lead by ID"""
-        for lead in self.leads:
-            if lead['id'] == lead_id:
-                return lead
-        return None
+        return self._lead_index.get(lead_id)
     
     def get_leads_by_status(self, status: str) -> List[Dict]:
-        """Get leads by status"""
-        return [lead for lead in self.leads if lead['status'] == status]
+        """Get leads by status, in insertion order"""
+        # Updated leads are re-appended to their status bucket
+        return self._in_insertion_order(self._by_status.get(status, []))
     
     def get_leads_by_score_range(self, min_score: int, max_score: int) -> List[Dict]:
-        """Get leads by score range"""
-        return [lead for lead in self.leads if min_score <= lead['score'] <= max_score]
+        """Get leads by score range, in insertion order"""
+        lo = bisect_left(self._scores, min_score)
+        hi = bisect_right(self._scores, max_score)
+        return self._in_insertion_order([self._lead_index[lead_id] for lead_id in self._score_ids[lo:hi]])
+    
+    def _count_score_range(self, min_score: int, max_score: int) -> int:
+        """Number of leads in a score range, without materializing them"""
+        return bisect_right(self._scores, max_score) - bisect_left(self._scores, min_score)
     
     def get_hot_leads(self) -> List[Dict]:
         """Get hot leads (score 80-100)"""
@@ -96,49 +264,57 @@ class LeadDatabase:
     
     def update_lead(self, lead_id: str, updates: Dict) -> bool:
         """Update a lead"""
-        for i, lead in enumerate(self.leads):
-            if lead['id'] == lead_id:
-                self.leads[i].update(updates)
-                self.leads[i]['updated_at'] = datetime.now().isoformat()
-                self.save_leads()
-                return True
-        return False
+        with self._lock:
+            lead = self._lead_index.get(lead_id)
+            if lead is None:
+                return False
+            
+            self._unindex_lead(lead)
+            lead.update(updates)
+            self._index_lead(lead)
+            lead['updated_at'] = datetime.now().isoformat()
+            self._mark_dirty(lead_id, lead)
+        return True
     
     def delete_lead(self, lead_id: str) -> bool:
         """Delete a lead"""
-        for i, lead in enumerate(self.leads):
-            if lead['id'] == lead_id:
-                del self.leads[i]
-                self.save_leads()
-                return True
-        return False
+        with self._lock:
+            lead = self._lead_index.pop(lead_id, None)
+            if lead is None:
+                return False
+            
+            self.leads.remove(lead)
+            self._unindex_lead(lead)
+            del self._order[lead_id]
+            self._mark_dirty(lead_id, {'id': lead_id, '_deleted': True})
+        return True
     
-    def search_leads(self, query: str) -> List[Dict]:
-        """Search leads by name, email, or company"""
-        if not query:
+    def search_leads(self, query: str, status: Optional[str] = None,
+                     min_score: Optional[float] = None,
+                     max_score: Optional[float] = None) -> List[Dict]:
+        """Search leads by name, email, or company, optionally narrowed by
+        status and an inclusive score range"""
+        if not (query or status or min_score is not None or max_score is not None):
             return self.leads
-            
-        results = []
-        query = query.lower()
         
-        for lead in self.leads:
-            # Ensure all fields are strings before calling .lower()
-            name = str(lead.get('name', '')) if lead.get('name') is not None else ''
-            email = str(lead.get('email', '')) if lead.get('email') is not None else ''
-            company = str(lead.get('company', '')) if lead.get('company') is not None else ''
-            
-            if (query in name.lower() or 
-                query in email.lower() or 
-                query in company.lower()):
-                results.append(lead)
-        return results
+        # All filters are applied in one pass over the leads, in insertion order
+        query = query.lower() if query else ''
+        blobs = self._search_blobs
+        lo = float('-inf') if min_score is None else min_score
+        hi = float('inf') if max_score is None else max_score
+        return [
+            lead for lead in self.leads
+            if (not status or lead['status'] == status)
+            and lo <= lead['score'] <= hi
+            and (not query or query in blobs[lead['id']])
+        ]
     
     def get_lead_statistics(self) -> Dict:
         """Get lead statistics"""
         total = len(self.leads)
-        hot = len(self.get_hot_leads())
-        warm = len(self.get_warm_leads())
-        cold = len(self.get_cold_leads())
+        hot = self._count_score_range(80, 100)
+        warm = self._count_score_range(60, 79)
+        cold = self._count_score_range(0, 59)
         
         return {
             'total_leads': total,
@@ -152,6 +328,10 @@ class LeadDatabase:
         """Get all leads"""
         return self.leads
     
+    def version(self) -> int:
+        """Change counter, incremented whenever a lead is added, updated or deleted"""
+        return self._version
+    
     def get_leads_by_category(self, category: str) -> List[Dict]:
         """Get leads by category"""
         return [lead for lead in self.leads if lead.get('category', 'General') == category]
@@ -166,11 +346,19 @@ class LeadDatabase:
     def export_leads(self, format: str = 'csv') -> str:
         """Export leads to CSV"""
         if format == 'csv':
-            df = pd.DataFrame(self.leads)
             filename = f"leads_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df.to_csv(filename, index=False)
+            # Column order follows first appearance, as a DataFrame would
+            fieldnames = list(dict.fromkeys(key for lead in self.leads for key in lead))
+            with open(filename, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(self.leads)
             return filename
         return None
 
-# Global lead database instance
-lead_db = LeadDatabase()
+# Global lead database instance, created on first use so importing this module
+# does no file I/O
+@lru_cache(maxsize=1)
+def get_lead_db() -> LeadDatabase:
+    """Return the shared LeadDatabase"""
+    return LeadDatabase()
@@ -9,10 +9,23 @@ import plotly.graph_objects as go
 import numpy as np
 from datetime import datetime, timedelta
 import random
+import re
+import string
+import hashlib
+import orjson
+from functools import lru_cache
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from ai_email_generator import http_client, OPENROUTER_URL
 
-def load_ai_tools_css():
-    """Load custom CSS for AI tools page"""
-    st.markdown("""
+# Keyword alternations for lead scoring (substring matches, one scan per field)
+_CORP_RE = re.compile(r'inc|corp|llc|ltd')
+_EXEC_RE = re.compile(r'ceo|president|director|manager')
+_VP_RE = re.compile(r'vp|vice|head|lead')
+
+# Page CSS, built once at import
+_AI_TOOLS_CSS = """
     <style>
     .ai-header {
         background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -31,7 +44,9 @@ def load_ai_tools_css():
         left: 0;
         right: 0;
         bottom: 0;
-        background: url('data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><defs><pattern id="grid" width="10" height="10" patternUnits="userSpaceOnUse"><path d="M 10 0 L 0 0 0 10" fill="none" stroke="rgba(255,255,255,0.1)" stroke-width="0.5"/></pattern></defs><rect width="100" height="100" fill="url(%23grid)"/></svg>');
+        background:
+            repeating-linear-gradient(0deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px),
+            repeating-linear-gradient(90deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px);
         opacity: 0.3;
     }
     
@@ -70,56 +85,103 @@ def load_ai_tools_css():
         color: #2d5016;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def load_ai_tools_css():
+    """Load custom CSS for AI tools page"""
+    # Re-emitted every run: Streamlit drops elements a rerun does not render
+    st.markdown(_AI_TOOLS_CSS, unsafe_allow_html=True)
 
 def generate_email_content(topic, tone, length):
     """Generate AI email content using OpenRouter if available, else fallback to template"""
-    import requests
-    import json
-    
     api_key = st.session_state.get('openrouter_api_key', '')
     if api_key:
         try:
-            prompt = f"Write a {tone} {length} email about {topic} for lead generation. Include a subject line at the start."
-            
-            # Use Auto-Select logic (Llama 3.1 405B for high quality free generation)
-            model = "meta-llama/llama-3.1-405b-instruct:free" 
-            
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "HTTP-Referer": "http://localhost:8501",
-                    "X-Title": "Lead Scraper Pro AI Tools",
-                },
-                json={
-                    "model": model,
-                    "messages": [{"role": "user", "content": prompt}]
-                }
-            )
-            if response.status_code == 200:
-                res = response.json()
-                return res['choices'][0]['message']['content']
+            api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+            return _openrouter_email_content(topic, tone, length, api_key_hash, api_key)
         except Exception as e:
             st.error(f"OpenRouter Error: {e}")
 
-    # Fallback to templates
-    templates = {
-        "professional": [
-            f"Subject: {topic} - Professional Opportunity\n\nDear [Name],\n\nI hope this email finds you well. I wanted to reach out regarding {topic.lower()}. This presents an excellent opportunity for your business to achieve significant growth and success.\n\nOur solution has helped numerous companies like yours to streamline their operations and increase efficiency by up to 40%. We would love to discuss how we can help you achieve similar results.\n\nI would appreciate the opportunity to schedule a brief call to discuss this further. Please let me know your availability.\n\nBest regards,\n[Your Name]",
-            f"Subject: Exclusive {topic} Opportunity\n\nHello [Name],\n\nI hope you're having a great day. I'm writing to share an exclusive opportunity related to {topic.lower()} that I believe would be of great interest to your organization.\n\nOur innovative approach has been proven to deliver measurable results for businesses in your industry. We've seen an average improvement of 35% in key performance metrics.\n\nWould you be interested in a 15-minute conversation to explore how this could benefit your business?\n\nLooking forward to hearing from you.\n\nWarm regards,\n[Your Name]"
-        ],
-        "casual": [
-            f"Subject: Quick question about {topic}\n\nHi [Name],\n\nHope you're doing well! I came across your company and was really impressed by what you're doing. I thought you might be interested in learning about {topic.lower()}.\n\nWe've been helping businesses like yours save time and money with our innovative solutions. It's pretty cool stuff, and I'd love to show you how it works.\n\nGot 10 minutes for a quick chat? I promise it'll be worth your time!\n\nCheers,\n[Your Name]",
-            f"Subject: {topic} - Something you might like\n\nHey [Name],\n\nHow's it going? I wanted to reach out because I think you'd find our {topic.lower()} solution really interesting.\n\nWe've helped tons of companies boost their productivity and cut costs. The results speak for themselves - our clients typically see a 30% improvement within the first month.\n\nWant to grab a virtual coffee and chat about it? I'd love to show you what we can do.\n\nTalk soon,\n[Your Name]"
-        ],
-        "urgent": [
-            f"Subject: URGENT: {topic} - Limited Time Offer\n\nDear [Name],\n\nI'm reaching out with an urgent opportunity regarding {topic.lower()} that requires immediate attention.\n\nThis exclusive offer is only available for the next 48 hours and could significantly impact your business growth. Our solution has helped companies achieve 50% faster results compared to traditional methods.\n\nTime is of the essence. Please respond as soon as possible to secure your spot.\n\nBest regards,\n[Your Name]",
-            f"Subject: {topic} - Action Required Today\n\nHello [Name],\n\nI need to bring something important to your attention regarding {topic.lower()}. This opportunity won't be available for long.\n\nOur clients have seen remarkable improvements in efficiency and cost savings. Don't miss out on this chance to transform your business operations.\n\nPlease reply today to discuss next steps.\n\nRegards,\n[Your Name]"
-        ]
+    return _template_email_content(topic, tone)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _openrouter_email_content(topic, tone, length, api_key_hash, _api_key):
+    """Generate email content with OpenRouter, cached per topic/tone/length and key"""
+    prompt = f"Write a {tone} {length} email about {topic} for lead generation. Include a subject line at the start."
+    
+    # Use Auto-Select logic (Llama 3.1 405B for high quality free generation)
+    model = "meta-llama/llama-3.1-405b-instruct:free" 
+    
+    response = http_client.post(
+        OPENROUTER_URL,
+        headers={
+            "Authorization": f"Bearer {_api_key}",
+            "HTTP-Referer": "http://localhost:8501",
+            "X-Title": "Lead Scraper Pro AI Tools",
+        },
+        json={
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+    )
+    # Raise rather than return so failed calls are never cached
+    response.raise_for_status()
+    res = orjson.loads(response.content)
+    return res['choices'][0]['message']['content']
+
+# Fallback email templates; $topic / $topic_lower are filled per call
+_EMAIL_TEMPLATES = {
+    "professional": [
+        "Subject: $topic - Professional Opportunity\n\nDear [Name],\n\nI hope this email finds you well. I wanted to reach out regarding $topic_lower. This presents an excellent opportunity for your business to achieve significant growth and success.\n\nOur solution has helped numerous companies like yours to streamline their operations and increase efficiency by up to 40%. We would love to discuss how we can help you achieve similar results.\n\nI would appreciate the opportunity to schedule a brief call to discuss this further. Please let me know your availability.\n\nBest regards,\n[Your Name]",
+        "Subject: Exclusive $topic Opportunity\n\nHello [Name],\n\nI hope you're having a great day. I'm writing to share an exclusive opportunity related to $topic_lower that I believe would be of great interest to your organization.\n\nOur innovative approach has been proven to deliver measurable results for businesses in your industry. We've seen an average improvement of 35% in key performance metrics.\n\nWould you be interested in a 15-minute conversation to explore how this could benefit your business?\n\nLooking forward to hearing from you.\n\nWarm regards,\n[Your Name]"
+    ],
+    "casual": [
+        "Subject: Quick question about $topic\n\nHi [Name],\n\nHope you're doing well! I came across your company and was really impressed by what you're doing. I thought you might be interested in learning about $topic_lower.\n\nWe've been helping businesses like yours save time and money with our innovative solutions. It's pretty cool stuff, and I'd love to show you how it works.\n\nGot 10 minutes for a quick chat? I promise it'll be worth your time!\n\nCheers,\n[Your Name]",
+        "Subject: $topic - Something you might like\n\nHey [Name],\n\nHow's it going? I wanted to reach out because I think you'd find our $topic_lower solution really interesting.\n\nWe've helped tons of companies boost their productivity and cut costs. The results speak for themselves - our clients typically see a 30% improvement within the first month.\n\nWant to grab a virtual coffee and chat about it? I'd love to show you what we can do.\n\nTalk soon,\n[Your Name]"
+    ],
+    "urgent": [
+        "Subject: URGENT: $topic - Limited Time Offer\n\nDear [Name],\n\nI'm reaching out with an urgent opportunity regarding $topic_lower that requires immediate attention.\n\nThis exclusive offer is only available for the next 48 hours and could significantly impact your business growth. Our solution has helped companies achieve 50% faster results compared to traditional methods.\n\nTime is of the essence. Please respond as soon as possible to secure your spot.\n\nBest regards,\n[Your Name]",
+        "Subject: $topic - Action Required Today\n\nHello [Name],\n\nI need to bring something important to your attention regarding $topic_lower. This opportunity won't be available for long.\n\nOur clients have seen remarkable improvements in efficiency and cost savings. Don't miss out on this chance to transform your business operations.\n\nPlease reply today to discuss next steps.\n\nRegards,\n[Your Name]"
+    ]
+}
+
+@lru_cache(maxsize=256)
+def _template_email_variants(topic, tone):
+    """Every fallback template for a tone, filled in once per topic"""
+    return tuple(
+        string.Template(template).safe_substitute(topic=topic, topic_lower=topic.lower())
+        for template in _EMAIL_TEMPLATES.get(tone, _EMAIL_TEMPLATES["professional"])
+    )
+
+def _template_email_content(topic, tone):
+    """Fallback template email; the variant is picked afresh on every call"""
+    return random.choice(_template_email_variants(topic, tone))
+
+@lru_cache(maxsize=256)
+def _analyze_intent(lead_input):
+    """Simulated intent score and tone, stable for the same interaction text"""
+    return random.randint(40, 95), random.choice(["Curious", "Skeptical", "Urgent", "Informational"])
+
+@st.cache_resource(show_spinner=False)
+def _perf_by_day_fig() -> go.Figure:
+    """Constant day-of-week performance chart, built once per process"""
+    # Generate some sample insights
+    insights_data = {
+        'Day': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+        'Open Rate': [22.1, 24.5, 26.8, 25.2, 23.9, 18.7, 16.3],
+        'Click Rate': [2.8, 3.2, 3.5, 3.1, 2.9, 2.1, 1.8]
     }
     
-    return random.choice(templates.get(tone, templates["professional"]))
+    fig = px.line(
+        insights_data, 
+        x='Day', 
+        y=['Open Rate', 'Click Rate'],
+        title="Email Performance by Day of Week",
+        markers=True,
+        render_mode='webgl'
+    )
+    fig.update_layout(yaxis_title="Rate (%)")
+    return fig
 
 def generate_lead_score(lead_data):
     """Generate AI lead score"""
@@ -134,14 +196,14 @@ def generate_lead_score(lead_data):
     
     # Company size scoring
     company = lead_data.get('company', '').lower()
-    if any(word in company for word in ['inc', 'corp', 'llc', 'ltd']):
+    if _CORP_RE.search(company):
         base_score += 15
     
     # Job title scoring
     title = lead_data.get('title', '').lower()
-    if any(word in title for word in ['ceo', 'president', 'director', 'manager']):
+    if _EXEC_RE.search(title):
         base_score += 25
-    elif any(word in title for word in ['vp', 'vice', 'head', 'lead']):
+    elif _VP_RE.search(title):
         base_score += 20
     
     # Add some randomness for demo
@@ -396,8 +458,7 @@ def show_ai_tools():
             if lead_input:
                 with st.spinner("🤖 AI is decoding lead intent..."):
                     # Simulation of AI Analysis (In real use, this could call OpenRouter)
-                    intent_score = random.randint(40, 95)
-                    tone = random.choice(["Curious", "Skeptical", "Urgent", "Informational"])
+                    intent_score, tone = _analyze_intent(lead_input)
                     st.markdown(f"""
                     <div class="result-box">
                         <h4>AI Analysis Result:</h4>
@@ -426,22 +487,7 @@ def show_ai_tools():
 
     st.subheader("📈 Performance Intelligence")
     
-    # Generate some sample insights
-    insights_data = {
-        'Day': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
-        'Open Rate': [22.1, 24.5, 26.8, 25.2, 23.9, 18.7, 16.3],
-        'Click Rate': [2.8, 3.2, 3.5, 3.1, 2.9, 2.1, 1.8]
-    }
-    
-    fig = px.line(
-        insights_data, 
-        x='Day', 
-        y=['Open Rate', 'Click Rate'],
-        title="Email Performance by Day of Week",
-        markers=True
-    )
-    fig.update_layout(yaxis_title="Rate (%)")
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(_perf_by_day_fig(), use_container_width=True)
     
     # AI predictions
     st.markdown("""
@@ -8,15 +8,19 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+import io
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
-import seaborn as sns
-import matplotlib.pyplot as plt
 
-def load_analytics_css():
-    """Load custom CSS for data analytics page"""
-    st.markdown("""
+try:
+    import pyarrow
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Page CSS, built once at import
+_ANALYTICS_CSS = """
     <style>
     .analytics-header {
         background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -35,7 +39,9 @@ def load_analytics_css():
         left: 0;
         right: 0;
         bottom: 0;
-        background: url('data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><defs><pattern id="grid" width="10" height="10" patternUnits="userSpaceOnUse"><path d="M 10 0 L 0 0 0 10" fill="none" stroke="rgba(255,255,255,0.1)" stroke-width="0.5"/></pattern></defs><rect width="100" height="100" fill="url(%23grid)"/></svg>');
+        background:
+            repeating-linear-gradient(0deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px),
+            repeating-linear-gradient(90deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px);
         opacity: 0.3;
     }
     
@@ -59,6 +65,12 @@ def load_analytics_css():
         transform: translateY(-5px);
     }
     
+    .metric-row {
+        display: grid;
+        grid-template-columns: repeat(4, 1fr);
+        gap: 1rem;
+    }
+    
     .chart-container {
         background: white;
         border-radius: 1rem;
@@ -102,7 +114,214 @@ def load_analytics_css():
         border-left: 5px solid #4caf50;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def load_analytics_css():
+    """Load custom CSS for data analytics page"""
+    # Re-emitted every run: Streamlit drops elements a rerun does not render
+    st.markdown(_ANALYTICS_CSS, unsafe_allow_html=True)
+
+def _metric_cards(cards):
+    """Render a row of metric cards with a single markdown call"""
+    html = "".join(
+        f'<div class="metric-card"><h3>{label}</h3><h2>{value}</h2></div>'
+        for label, value in cards
+    )
+    st.markdown(f'<div class="metric-row">{html}</div>', unsafe_allow_html=True)
+
+@st.cache_data(show_spinner=False)
+def _load_dataframe(raw: bytes, name: str) -> pd.DataFrame:
+    """Parse an uploaded CSV/Excel file, cached by its bytes and name"""
+    if name.endswith('.csv'):
+        # The multithreaded Arrow parser when available; columns stay NumPy-backed
+        # so select_dtypes/corr/plotting behave as before
+        df = pd.read_csv(io.BytesIO(raw), engine='pyarrow' if PYARROW_AVAILABLE else 'c')
+    elif name.endswith('.xlsx'):
+        # Stream rows instead of building the full openpyxl cell tree
+        df = pd.read_excel(io.BytesIO(raw), engine='openpyxl',
+                           engine_kwargs={'read_only': True, 'data_only': True})
+    else:
+        df = pd.read_excel(io.BytesIO(raw))
+    
+    # Shrink integer columns to the smallest dtype that holds them. Floats stay
+    # float64: this frame feeds describe() and the cleaned CSV export, and
+    # float32 would round the user's values; _corr makes its own float32 copy
+    for col in df.select_dtypes('integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+@st.cache_data(show_spinner=False)
+def _quality_stats(raw: bytes, name: str) -> dict:
+    """Quality-analysis summaries for an uploaded file, computed once per file"""
+    df = _load_dataframe(raw, name)
+    isna = df.isna()
+    return {
+        'missing': isna.sum(),
+        'total_missing': int(isna.to_numpy().sum()),
+        'describe': df.describe(),
+        'dtypes': df.dtypes.value_counts(),
+        'mem_mb': df.memory_usage(deep=True).sum() / 1024**2,
+        'duplicates': df.duplicated().sum(),
+        'numeric_columns': tuple(df.select_dtypes(include='number').columns)
+    }
+
+@st.cache_data(show_spinner=False)
+def _corr(raw: bytes, name: str, cols: tuple) -> pd.DataFrame:
+    """Correlation matrix of the given columns, computed once per file"""
+    cols = list(cols)
+    data = _load_dataframe(raw, name)[cols]
+    values = data.to_numpy(dtype=np.float32, na_value=np.nan)
+    if np.isnan(values).any():
+        # np.corrcoef has no pairwise NaN handling; keep pandas' semantics
+        return data.corr()
+    return pd.DataFrame(np.corrcoef(values, rowvar=False), index=cols, columns=cols)
+
+@st.cache_data(show_spinner=False)
+def _csv_bytes(raw: bytes, name: str) -> bytes:
+    """CSV export of the loaded data, serialized once per file"""
+    buf = io.BytesIO()
+    _load_dataframe(raw, name).to_csv(buf, index=False)
+    return buf.getvalue()
+
+# The preview grid scrolls client-side, but st.dataframe ships every row it
+# is given; cap it so huge uploads don't blow the websocket message limit
+_MAX_PREVIEW_ROWS = 10000
+
+# Scatter plots beyond this many points are sampled; the browser cannot
+# usefully draw more and every point is shipped over the websocket
+_MAX_PLOT_POINTS = 20000
+
+def _plot_sample(df: pd.DataFrame, cols: list, n: int = _MAX_PLOT_POINTS) -> pd.DataFrame:
+    """Uniform random sample of the plotted columns, capped at n rows"""
+    cols = list(dict.fromkeys(cols))
+    if len(df) <= n:
+        return df[cols]
+    return df[cols].sample(n, random_state=0)
+
+@st.fragment
+def _viz_fragment(df: pd.DataFrame, numeric_columns: tuple, corr_matrix: pd.DataFrame):
+    """Axis pickers and plots; changing an axis reruns only this fragment"""
+    if len(numeric_columns) >= 2:
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            x_col = st.selectbox("X-axis", numeric_columns)
+        with col2:
+            y_col = st.selectbox("Y-axis", numeric_columns)
+        
+        if len(numeric_columns) >= 3:
+            z_col = st.selectbox("Z-axis", numeric_columns)
+        else:
+            z_col = None
+        
+        # 3D Scatter Plot
+        if z_col:
+            plot_df = _plot_sample(df, [x_col, y_col, z_col])
+            fig_3d = go.Figure(data=[go.Scatter3d(
+                x=plot_df[x_col], y=plot_df[y_col], z=plot_df[z_col],
+                mode='markers',
+                marker=dict(
+                    color=plot_df[x_col],
+                    colorscale='Plasma',
+                    colorbar=dict(title=x_col),
+                    opacity=0.7
+                )
+            )])
+            # uirevision keeps the camera where the user left it when an
+            # axis changes, and the stable key reuses the chart element
+            fig_3d.update_layout(
+                title="3D Scatter Plot",
+                uirevision='viz',
+                scene=dict(
+                    xaxis_title=x_col,
+                    yaxis_title=y_col,
+                    zaxis_title=z_col
+                )
+            )
+            st.plotly_chart(fig_3d, use_container_width=True, key='viz3d')
+        
+        # 2D Scatter Plot
+        plot_df = _plot_sample(df, [x_col, y_col])
+        fig_2d = px.scatter(
+            plot_df, x=x_col, y=y_col,
+            title="2D Scatter Plot",
+            color=plot_df[x_col] if x_col else None,
+            opacity=0.7,
+            render_mode='webgl'
+        )
+        st.plotly_chart(fig_2d, use_container_width=True)
+        
+        # Correlation Heatmap
+        if len(numeric_columns) > 2:
+            st.subheader("🔥 Correlation Heatmap")
+            fig_heatmap = px.imshow(
+                corr_matrix,
+                title="Correlation Matrix",
+                color_continuous_scale="RdBu",
+                aspect="auto"
+            )
+            st.plotly_chart(fig_heatmap, use_container_width=True)
+
+@st.cache_data(show_spinner=False)
+def _iqr(raw: bytes, name: str, col: str) -> tuple:
+    """Quartiles and IQR of one column, computed once per file and column"""
+    values = _load_dataframe(raw, name)[col].to_numpy(dtype=float, na_value=np.nan)
+    q1, q3 = np.nanquantile(values, [0.25, 0.75])
+    return q1, q3, q3 - q1
+
+@st.fragment
+def _outlier_fragment(df: pd.DataFrame, raw: bytes, name: str, numeric_columns: tuple):
+    """Outlier column picker and report; changing the column reruns only this fragment"""
+    outlier_col = st.selectbox("Select column for outlier analysis", numeric_columns)
+    
+    Q1, Q3, IQR = _iqr(raw, name, outlier_col)
+    lower_bound = Q1 - 1.5 * IQR
+    upper_bound = Q3 + 1.5 * IQR
+    
+    outliers = df[(df[outlier_col] < lower_bound) | (df[outlier_col] > upper_bound)]
+    
+    if len(outliers) > 0:
+        st.markdown(f"""
+        <div class="warning-box">
+            <h4>⚠️ Outliers Detected</h4>
+            <p>{len(outliers)} outliers found in {outlier_col}</p>
+        </div>
+        """, unsafe_allow_html=True)
+        st.dataframe(outliers[[outlier_col]], use_container_width=True)
+    else:
+        st.markdown("""
+        <div class="success-box">
+            <h4>✅ No Outliers Detected</h4>
+            <p>Your data looks clean in this column!</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+@st.cache_resource(show_spinner=False)
+def _predictive_fig() -> go.Figure:
+    """Sample 3D lead-quality clusters; input-independent, so built once per process"""
+    # Generate sample 3D data for visualization
+    rng = np.random.default_rng(0)
+    n_points = 200
+    x_data = rng.normal(50, 15, n_points) # Engagement
+    y_data = rng.normal(60, 20, n_points) # Sentiment
+    z_data = (x_data * 0.4 + y_data * 0.6) + rng.normal(0, 5, n_points) # Convert Probability
+    categories = np.where(z_data > 70, 'High Potential', np.where(z_data > 40, 'Nurturing', 'Low Interest'))
+    
+    fig_3d = px.scatter_3d(
+        x=x_data, y=y_data, z=z_data,
+        color=categories,
+        labels={'x': 'Engagement Score', 'y': 'Lead Sentiment', 'z': 'Conversion %'},
+        title="Lead Quality Predictive Model (3D Cluster Analysis)",
+        opacity=0.7,
+        color_discrete_map={'High Potential': '#00ff00', 'Nurturing': '#ffff00', 'Low Interest': '#ff0000'}
+    )
+    fig_3d.update_layout(scene = dict(
+        xaxis_title='Engagement',
+        yaxis_title='Sentiment',
+        zaxis_title='Conversion %'),
+        margin=dict(r=0, l=0, b=0, t=30)
+    )
+    return fig_3d
 
 def show_data_analytics():
     """Data Analytics Dashboard with real data analysis"""
@@ -135,10 +354,9 @@ def show_data_analytics():
     if uploaded_file is not None:
         try:
             # Load data
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            raw = uploaded_file.getvalue()
+            df = _load_dataframe(raw, uploaded_file.name)
+            stats = _quality_stats(raw, uploaded_file.name)
             
             st.markdown(f"""
             <div class="success-box">
@@ -149,58 +367,31 @@ def show_data_analytics():
             
             # Data overview metrics
             st.subheader("📋 Data Overview")
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.markdown("""
-                <div class="metric-card">
-                    <h3>Total Rows</h3>
-                    <h2>{:,}</h2>
-                </div>
-                """.format(len(df)), unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown("""
-                <div class="metric-card">
-                    <h3>Total Columns</h3>
-                    <h2>{:,}</h2>
-                </div>
-                """.format(len(df.columns)), unsafe_allow_html=True)
-            
-            with col3:
-                memory_mb = df.memory_usage(deep=True).sum() / 1024**2
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>Memory Usage</h3>
-                    <h2>{memory_mb:.2f} MB</h2>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col4:
-                missing_percent = (df.isnull().sum().sum() / (len(df) * len(df.columns))) * 100
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>Missing Data</h3>
-                    <h2>{missing_percent:.1f}%</h2>
-                </div>
-                """, unsafe_allow_html=True)
+            memory_mb = stats['mem_mb']
+            missing_percent = stats['total_missing'] / df.size * 100
+            _metric_cards([
+                ("Total Rows", f"{len(df):,}"),
+                ("Total Columns", f"{len(df.columns):,}"),
+                ("Memory Usage", f"{memory_mb:.2f} MB"),
+                ("Missing Data", f"{missing_percent:.1f}%"),
+            ])
             
             # Data preview
             st.subheader("👀 Data Preview")
-            st.dataframe(df.head(10), use_container_width=True)
+            st.dataframe(df.head(_MAX_PREVIEW_ROWS), use_container_width=True, height=350)
             
             # Data quality analysis
             st.subheader("🔍 Data Quality Analysis")
             
             # Missing values analysis
-            missing_data = df.isnull().sum()
+            missing_data = stats['missing']
             missing_percent = (missing_data / len(df)) * 100
             
             col1, col2 = st.columns(2)
             
             with col1:
                 st.write("**Missing Values Count:**")
-                if missing_data.sum() > 0:
+                if stats['total_missing'] > 0:
                     missing_df = pd.DataFrame({
                         'Column': missing_data[missing_data > 0].index,
                         'Missing Count': missing_data[missing_data > 0].values
@@ -240,7 +431,7 @@ def show_data_analytics():
             
             # Data types analysis
             st.subheader("📊 Data Types Distribution")
-            dtype_counts = df.dtypes.value_counts()
+            dtype_counts = stats['dtypes']
             fig_dtypes = px.pie(
                 values=dtype_counts.values,
                 names=[str(x) for x in dtype_counts.index],
@@ -250,70 +441,25 @@ def show_data_analytics():
             
             # Statistical summary
             st.subheader("📈 Statistical Summary")
-            st.dataframe(df.describe(), use_container_width=True)
+            st.dataframe(stats['describe'], use_container_width=True)
             
             # Interactive 3D visualizations
             st.subheader("🎨 Interactive 3D Visualizations")
             
             # Select columns for visualization
-            numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+            numeric_columns = stats['numeric_columns']
             
-            if len(numeric_columns) >= 2:
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    x_col = st.selectbox("X-axis", numeric_columns)
-                with col2:
-                    y_col = st.selectbox("Y-axis", numeric_columns)
-                
-                if len(numeric_columns) >= 3:
-                    z_col = st.selectbox("Z-axis", numeric_columns)
-                else:
-                    z_col = None
-                
-                # 3D Scatter Plot
-                if z_col:
-                    fig_3d = px.scatter_3d(
-                        df, x=x_col, y=y_col, z=z_col,
-                        title="3D Scatter Plot",
-                        color=df[x_col] if x_col else None,
-                        opacity=0.7
-                    )
-                    fig_3d.update_layout(
-                        scene=dict(
-                            xaxis_title=x_col,
-                            yaxis_title=y_col,
-                            zaxis_title=z_col
-                        )
-                    )
-                    st.plotly_chart(fig_3d, use_container_width=True)
-                
-                # 2D Scatter Plot
-                fig_2d = px.scatter(
-                    df, x=x_col, y=y_col,
-                    title="2D Scatter Plot",
-                    color=df[x_col] if x_col else None,
-                    opacity=0.7
-                )
-                st.plotly_chart(fig_2d, use_container_width=True)
-                
-                # Correlation Heatmap
-                if len(numeric_columns) > 2:
-                    st.subheader("🔥 Correlation Heatmap")
-                    corr_matrix = df[numeric_columns].corr()
-                    fig_heatmap = px.imshow(
-                        corr_matrix,
-                        title="Correlation Matrix",
-                        color_continuous_scale="RdBu",
-                        aspect="auto"
-                    )
-                    st.plotly_chart(fig_heatmap, use_container_width=True)
+            if len(numeric_columns) > 2:
+                corr_matrix = _corr(raw, uploaded_file.name, numeric_columns)
+            else:
+                corr_matrix = None
+            _viz_fragment(df, numeric_columns, corr_matrix)
             
             # Data cleaning suggestions
             st.subheader("🧹 Data Cleaning Suggestions")
             
             # Missing values
-            if missing_data.sum() > 0:
+            if stats['total_missing'] > 0:
                 st.markdown("""
                 <div class="warning-box">
                     <h4>⚠️ Missing Values Detected</h4>
@@ -327,7 +473,7 @@ def show_data_analytics():
                 """, unsafe_allow_html=True)
             
             # Duplicates
-            duplicates = df.duplicated().sum()
+            duplicates = stats['duplicates']
             if duplicates > 0:
                 st.markdown(f"""
                 <div class="warning-box">
@@ -339,69 +485,22 @@ def show_data_analytics():
             # Outliers detection
             if len(numeric_columns) > 0:
                 st.subheader("📊 Outlier Detection")
-                outlier_col = st.selectbox("Select column for outlier analysis", numeric_columns)
-                
-                Q1 = df[outlier_col].quantile(0.25)
-                Q3 = df[outlier_col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                
-                outliers = df[(df[outlier_col] < lower_bound) | (df[outlier_col] > upper_bound)]
-                
-                if len(outliers) > 0:
-                    st.markdown(f"""
-                    <div class="warning-box">
-                        <h4>⚠️ Outliers Detected</h4>
-                        <p>{len(outliers)} outliers found in {outlier_col}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    st.dataframe(outliers[[outlier_col]], use_container_width=True)
-                else:
-                    st.markdown("""
-                    <div class="success-box">
-                        <h4>✅ No Outliers Detected</h4>
-                        <p>Your data looks clean in this column!</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                _outlier_fragment(df, raw, uploaded_file.name, numeric_columns)
             
             # Predictive Intelligence Section
             st.divider()
             st.subheader("🚀 Predictive Intelligence (3D)")
             
-            # Generate sample 3D data for visualization
-            n_points = 200
-            x_data = np.random.normal(50, 15, n_points) # Engagement
-            y_data = np.random.normal(60, 20, n_points) # Sentiment
-            z_data = (x_data * 0.4 + y_data * 0.6) + np.random.normal(0, 5, n_points) # Convert Probability
-            categories = np.where(z_data > 70, 'High Potential', np.where(z_data > 40, 'Nurturing', 'Low Interest'))
-            
-            fig_3d = px.scatter_3d(
-                x=x_data, y=y_data, z=z_data,
-                color=categories,
-                labels={'x': 'Engagement Score', 'y': 'Lead Sentiment', 'z': 'Conversion %'},
-                title="Lead Quality Predictive Model (3D Cluster Analysis)",
-                opacity=0.7,
-                color_discrete_map={'High Potential': '#00ff00', 'Nurturing': '#ffff00', 'Low Interest': '#ff0000'}
-            )
-            fig_3d.update_layout(scene = dict(
-                xaxis_title='Engagement',
-                yaxis_title='Sentiment',
-                zaxis_title='Conversion %'),
-                margin=dict(r=0, l=0, b=0, t=30)
-            )
-            st.plotly_chart(fig_3d, use_container_width=True)
+            st.plotly_chart(_predictive_fig(), use_container_width=True)
             
             # Export cleaned data
             st.subheader("💾 Export Cleaned Data")
-            if st.button("Download Cleaned Data as CSV"):
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="Download CSV",
-                    data=csv,
-                    file_name=f"cleaned_{uploaded_file.name}",
-                    mime="text/csv"
-                )
+            st.download_button(
+                label="Download Cleaned Data as CSV",
+                data=_csv_bytes(raw, uploaded_file.name),
+                file_name=f"cleaned_{Path(uploaded_file.name).stem}.csv",
+                mime="text/csv"
+            )
             
         except Exception as e:
             st.error(f"❌ Error loading file: {str(e)}")
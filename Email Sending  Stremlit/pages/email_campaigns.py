@@ -4,22 +4,106 @@ Email Campaigns Page - Campaign Management and Tracking
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
 from datetime import datetime, timedelta
+from collections import Counter
 import random
+import time
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from lead_database import lead_db
-from ai_email_generator import ai_email_generator
-from email_sender import email_sender
+from lead_database import get_lead_db
+from ai_email_generator import get_ai_email_generator
+from email_sender import get_email_sender, personalize
 from email_scheduler import email_scheduler
 
-def load_campaign_css():
-    """Load custom CSS for email campaigns page"""
-    st.markdown("""
+SENT_STATUSES = frozenset({'sent', 'opened', 'clicked', 'replied'})
+OPENED_STATUSES = frozenset({'opened', 'clicked', 'replied'})
+CLICKED_STATUSES = frozenset({'clicked', 'replied'})
+
+# Usage counter writes during a send are batched: at most one per this many
+# sent emails or this many seconds, plus a final one when the loop ends
+USAGE_FLUSH_EVERY = 50
+USAGE_FLUSH_SECONDS = 5.0
+
+# Send progress is redrawn at most this often (seconds) or on every 1% step
+UI_UPDATE_INTERVAL = 0.1
+
+# Lead lookups keyed on the database version so reruns skip the full scans;
+# cache_resource hands back the same list instead of unpickling a copy
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _cached_categories(version):
+    """Sorted lead categories for one database version"""
+    return get_lead_db().get_all_categories()
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _cached_leads_by_category(category, version):
+    """Leads in one category for one database version"""
+    return get_lead_db().get_leads_by_category(category)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _cached_lead_labels(version):
+    """Custom-selection label -> lead lookup for one database version"""
+    # Labels live here rather than on the lead dicts, which are persisted
+    # and exported as-is; the multiselect options reuse these same strings
+    label_to_lead = {}
+    for lead in get_lead_db().get_all_leads():
+        label_to_lead.setdefault(f"{lead['name']} ({lead['company']}) - Score: {lead['score']}", lead)
+    return label_to_lead
+
+_CAMPAIGN_COLUMNS = ['Campaign ID', 'Total Sent', 'Delivered', 'Opened', 'Clicked', 'Replied',
+                     'Delivery Rate', 'Open Rate', 'Click Rate', 'Reply Rate']
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _campaign_rows(version):
+    """Per-campaign performance rows for one email sender version"""
+    all_stats = get_email_sender().get_campaign_stats_bulk()
+    rows = []
+    for campaign_id in sorted(all_stats):
+        stats = all_stats[campaign_id]
+        rows.append((
+            campaign_id,
+            stats['total_sent'],
+            stats['delivered'],
+            stats['opened'],
+            stats['clicked'],
+            stats['replied'],
+            f"{stats['delivery_rate']:.1f}%",
+            f"{stats['open_rate']:.1f}%",
+            f"{stats['click_rate']:.1f}%",
+            f"{stats['reply_rate']:.1f}%"
+        ))
+    return tuple(rows)
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _campaign_fig(rows):
+    """Campaign comparison chart, rebuilt only when the stats change"""
+    # Plotly is only loaded once there is more than one campaign to compare
+    import plotly.express as px
+    fig = px.bar(
+        pd.DataFrame(rows, columns=_CAMPAIGN_COLUMNS),
+        x='Campaign ID',
+        y=['Delivery Rate', 'Open Rate', 'Click Rate', 'Reply Rate'],
+        title="Campaign Performance Comparison",
+        barmode='group'
+    )
+    fig.update_layout(xaxis_tickangle=-45, uirevision='campaign_comparison')
+    return fig
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _email_status_counts(version):
+    """Tally email logs by status for one email sender version"""
+    return Counter(e['status'] for e in get_email_sender().get_all_emails())
+
+def _metric_cards(cards):
+    """Render a row of metric cards with a single markdown call"""
+    html = "".join(
+        f'<div class="metric-card"><h3>{label}</h3><h2>{value}</h2></div>'
+        for label, value in cards
+    )
+    st.markdown(f'<div class="metric-row">{html}</div>', unsafe_allow_html=True)
+
+# Page CSS, built once at import
+_CAMPAIGN_CSS = """
     <style>
     .campaign-header {
         background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -38,7 +122,9 @@ def load_campaign_css():
         left: 0;
         right: 0;
         bottom: 0;
-        background: url('data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><defs><pattern id="grid" width="10" height="10" patternUnits="userSpaceOnUse"><path d="M 10 0 L 0 0 0 10" fill="none" stroke="rgba(255,255,255,0.1)" stroke-width="0.5"/></pattern></defs><rect width="100" height="100" fill="url(%23grid)"/></svg>');
+        background:
+            repeating-linear-gradient(0deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px),
+            repeating-linear-gradient(90deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px);
         opacity: 0.3;
     }
     
@@ -76,6 +162,12 @@ def load_campaign_css():
         transform: translateY(-5px);
     }
     
+    .metric-row {
+        display: grid;
+        grid-template-columns: repeat(4, 1fr);
+        gap: 1rem;
+    }
+    
     .form-section {
         background: linear-gradient(135deg, #43e97b 0%, #38f9d7 100%);
         border-radius: 1rem;
@@ -92,23 +184,31 @@ def load_campaign_css():
         color: #2d5016;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def load_campaign_css():
+    """Load custom CSS for email campaigns page"""
+    # Re-emitted every run: Streamlit drops elements a rerun does not render
+    st.markdown(_CAMPAIGN_CSS, unsafe_allow_html=True)
 
 def generate_campaign_metrics():
-    """Generate sample campaign metrics"""
-    return {
-        'total_campaigns': random.randint(15, 25),
-        'active_campaigns': random.randint(3, 8),
-        'total_emails_sent': random.randint(5000, 15000),
-        'open_rate': round(random.uniform(20, 35), 1),
-        'click_rate': round(random.uniform(2, 5), 1),
-        'conversion_rate': round(random.uniform(1, 3), 1),
-        'bounce_rate': round(random.uniform(1, 3), 1)
-    }
+    """Generate sample campaign metrics once per session"""
+    if 'camp_metrics' not in st.session_state:
+        st.session_state['camp_metrics'] = {
+            'total_campaigns': random.randint(15, 25),
+            'active_campaigns': random.randint(3, 8),
+            'total_emails_sent': random.randint(5000, 15000),
+            'open_rate': round(random.uniform(20, 35), 1),
+            'click_rate': round(random.uniform(2, 5), 1),
+            'conversion_rate': round(random.uniform(1, 3), 1),
+            'bounce_rate': round(random.uniform(1, 3), 1)
+        }
+    return st.session_state['camp_metrics']
 
 def show_email_campaigns():
     """Email Campaigns Dashboard"""
     load_campaign_css()
+    now = datetime.now()
     
     st.markdown("""
     <div class="campaign-header">
@@ -123,48 +223,22 @@ def show_email_campaigns():
     st.subheader("📊 Campaign Overview")
     
     # Get real email statistics
-    all_emails = email_sender.get_all_emails()
-    total_emails = len(all_emails)
-    sent_emails = len([e for e in all_emails if e['status'] in ['sent', 'opened', 'clicked', 'replied']])
-    opened_emails = len([e for e in all_emails if e['status'] in ['opened', 'clicked', 'replied']])
-    clicked_emails = len([e for e in all_emails if e['status'] in ['clicked', 'replied']])
+    all_emails = get_email_sender().get_all_emails()
+    status_counts = _email_status_counts(get_email_sender().version())
+    total_emails = sum(status_counts.values())
+    sent_emails = sum(status_counts[s] for s in SENT_STATUSES)
+    opened_emails = sum(status_counts[s] for s in OPENED_STATUSES)
+    clicked_emails = sum(status_counts[s] for s in CLICKED_STATUSES)
     
     open_rate = (opened_emails / sent_emails * 100) if sent_emails > 0 else 0
     click_rate = (clicked_emails / opened_emails * 100) if opened_emails > 0 else 0
     
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3>Total Emails</h3>
-            <h2>{total_emails:,}</h2>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3>Delivered</h3>
-            <h2>{sent_emails:,}</h2>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3>Opened</h3>
-            <h2>{opened_emails:,}</h2>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown(f"""
-        <div class="metric-card">
-            <h3>Clicked</h3>
-            <h2>{clicked_emails:,}</h2>
-        </div>
-        """, unsafe_allow_html=True)
+    _metric_cards([
+        ("Total Emails", f"{total_emails:,}"),
+        ("Delivered", f"{sent_emails:,}"),
+        ("Opened", f"{opened_emails:,}"),
+        ("Clicked", f"{clicked_emails:,}"),
+    ])
     
     # Performance metrics
     col1, col2, col3 = st.columns(3)
@@ -209,10 +283,12 @@ def show_email_campaigns():
         anti_spam_shield = st.checkbox("🛡️ Enhanced Anti-Spam Shield", value=True, help="Uses human-like behavior patterns to avoid spam filters.")
         
     # Lead selection dropdown
+    lead_db = get_lead_db()
+    lead_db_version = lead_db.version()
     all_leads = lead_db.get_all_leads()
     if all_leads:
         # Get all categories
-        categories = lead_db.get_all_categories()
+        categories = _cached_categories(lead_db_version)
         
         # Lead selection options
         lead_options = ["All Leads", "Hot Leads (80-100)", "Warm Leads (60-79)", "Cold Leads (0-59)", "Custom Selection"]
@@ -225,17 +301,12 @@ def show_email_campaigns():
         
         # Custom lead selection
         if target_audience == "Custom Selection":
-            lead_names = [f"{lead['name']} ({lead['company']}) - Score: {lead['score']}" for lead in all_leads]
-            selected_lead_names = st.multiselect("Select Specific Leads", lead_names)
-            selected_leads = []
-            for name in selected_lead_names:
-                for lead in all_leads:
-                    if f"{lead['name']} ({lead['company']}) - Score: {lead['score']}" == name:
-                        selected_leads.append(lead)
-                        break
+            label_to_lead = _cached_lead_labels(lead_db_version)
+            selected_lead_names = st.multiselect("Select Specific Leads", list(label_to_lead))
+            selected_leads = [label_to_lead[name] for name in selected_lead_names]
         elif target_audience.startswith("Category: "):
             category_name = target_audience.replace("Category: ", "")
-            selected_leads = lead_db.get_leads_by_category(category_name)
+            selected_leads = _cached_leads_by_category(category_name, lead_db_version)
         else:
             selected_leads = []
             if target_audience == "Hot Leads (80-100)":
@@ -250,9 +321,6 @@ def show_email_campaigns():
         st.warning("No leads found. Please upload leads first in the Lead Management page.")
         target_audience = "No Leads Available"
         selected_leads = []
-        
-        send_time = st.time_input("Send Time", value=datetime.now().time())
-        send_date = st.date_input("Send Date", value=datetime.now().date())
     
     # Email content
     st.subheader("📄 Email Content")
@@ -271,7 +339,7 @@ def show_email_campaigns():
                     # Generate email for first lead as example
                     sample_lead = selected_leads[0]
                     api_key = st.session_state.get('openrouter_api_key')
-                    ai_email = ai_email_generator.generate_email(sample_lead, email_tone, api_key=api_key)
+                    ai_email = get_ai_email_generator().generate_email(sample_lead, email_tone, api_key=api_key)
                     
                     st.session_state['ai_generated_subject'] = ai_email['subject']
                     st.session_state['ai_generated_body'] = ai_email['body']
@@ -334,6 +402,7 @@ def show_email_campaigns():
     with col3:
         send_limit = st.number_input("Daily Send Limit", min_value=1, max_value=10000, value=1000)
         delay_between_emails = st.number_input("Delay Between Emails (seconds)", min_value=1, max_value=300, value=20)
+        emails_per_batch = st.number_input("Emails per Batch", min_value=1, max_value=20, value=1, help="Send this many emails together after each delay. Only raise this if your SMTP provider allows parallel sends.")
     
     # Scheduling options
     st.subheader("⏰ Email Scheduling")
@@ -345,11 +414,11 @@ def show_email_campaigns():
     
     with col2:
         if send_option == "Schedule for Later":
-            send_date = st.date_input("Send Date", value=datetime.now().date())
-            send_time = st.time_input("Send Time", value=datetime.now().time())
+            send_date = st.date_input("Send Date", value=now.date())
+            send_time = st.time_input("Send Time", value=now.time())
             send_datetime = datetime.combine(send_date, send_time)
         else:
-            send_datetime = datetime.now()
+            send_datetime = now
     
     # Create campaign button
     button_text = "🚀 Send Now" if send_option == "Send Now" else "⏰ Schedule Campaign"
@@ -367,19 +436,25 @@ def show_email_campaigns():
 
         if campaign_name and subject_line and email_content and selected_leads:
             # Check if email credentials are configured
-            if not email_sender.sender_email or not email_sender.sender_password:
+            if not get_email_sender().sender_email or not get_email_sender().sender_password:
                 st.error("❌ Email credentials not configured. Please set up SMTP settings in your .env file.")
                 st.info("Required: SMTP_USERNAME, SMTP_PASSWORD, SMTP_SERVER, SMTP_PORT")
                 return
             
             # Calculate campaign metrics
             total_leads = len(selected_leads)
-            hot_leads = len([lead for lead in selected_leads if lead['score'] >= 80])
-            warm_leads = len([lead for lead in selected_leads if 60 <= lead['score'] < 80])
-            cold_leads = len([lead for lead in selected_leads if lead['score'] < 60])
+            hot_leads = warm_leads = cold_leads = 0
+            for lead in selected_leads:
+                score = lead['score']
+                if score >= 80:
+                    hot_leads += 1
+                elif score >= 60:
+                    warm_leads += 1
+                else:
+                    cold_leads += 1
             
             # Generate campaign ID
-            campaign_id = f"{campaign_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            campaign_id = f"{campaign_name}_{now.strftime('%Y%m%d_%H%M%S')}"
             
             if send_option == "Send Now":
                 # Send emails immediately
@@ -393,26 +468,49 @@ def show_email_campaigns():
                     
                     sub_b = subject_b if enable_ab_test else None
                     
-                    for result in email_sender.send_bulk_emails_generator(
-                        recipients=selected_leads,
-                        subject=subject_line,
-                        body=email_content,
-                        campaign_id=campaign_id,
-                        delay_seconds=delay_between_emails,
-                        subject_b=sub_b
-                    ):
-                        results.append(result)
-                        sent_count += 1
-                        progress = sent_count / total_to_send
-                        progress_bar.progress(progress)
-                        variant_info = f" [Variant {result['ab_variant']}]" if enable_ab_test else ""
-                        status_text.text(f"📧 Sending email {sent_count}/{total_to_send}{variant_info} to {result['recipient_email']}...")
-                        
-                        # Update SaaS Usage Tracking in real-time if successful
-                        if result['status'] == 'sent':
-                            st.session_state.email_count += 1
-                            if 'db_handler' in st.session_state:
-                                st.session_state.db_handler.update_settings(st.session_state.username, {'email_count': st.session_state.email_count})
+                    # SaaS usage tracking: count in session state, persist in batches
+                    pending_usage = 0
+                    last_usage_flush = time.monotonic()
+                    last_ui_update = 0.0
+                    progress_step = max(1, total_to_send // 100)
+                    
+                    def flush_usage():
+                        nonlocal pending_usage, last_usage_flush
+                        if pending_usage and 'db_handler' in st.session_state:
+                            st.session_state.db_handler.update_settings(st.session_state.username, {'email_count': st.session_state.email_count})
+                        pending_usage = 0
+                        last_usage_flush = time.monotonic()
+                    
+                    try:
+                        for result in get_email_sender().send_bulk_emails_generator(
+                            recipients=selected_leads,
+                            subject=subject_line,
+                            body=email_content,
+                            campaign_id=campaign_id,
+                            delay_seconds=delay_between_emails,
+                            subject_b=sub_b,
+                            batch_size=emails_per_batch
+                        ):
+                            results.append(result)
+                            sent_count += 1
+                            # Not `now`: that is the page's datetime for this run
+                            tick = time.monotonic()
+                            if (tick - last_ui_update > UI_UPDATE_INTERVAL
+                                    or sent_count == total_to_send
+                                    or sent_count % progress_step == 0):
+                                progress_bar.progress(sent_count / total_to_send)
+                                variant_info = f" [Variant {result['ab_variant']}]" if enable_ab_test else ""
+                                status_text.text(f"📧 Sending email {sent_count}/{total_to_send}{variant_info} to {result['recipient_email']}...")
+                                last_ui_update = tick
+                            
+                            if result['status'] == 'sent':
+                                st.session_state.email_count += 1
+                                pending_usage += 1
+                                if (pending_usage >= USAGE_FLUSH_EVERY
+                                        or tick - last_usage_flush > USAGE_FLUSH_SECONDS):
+                                    flush_usage()
+                    finally:
+                        flush_usage()
                     
                     progress_bar.progress(1.0)
                     status_text.text("✅ Campaign execution finished!")
@@ -466,7 +564,7 @@ def show_email_campaigns():
                     """, unsafe_allow_html=True)
                     
                     # Show countdown
-                    time_until_send = send_datetime - datetime.now()
+                    time_until_send = send_datetime - now
                     if time_until_send.total_seconds() > 0:
                         hours = int(time_until_send.total_seconds() // 3600)
                         minutes = int((time_until_send.total_seconds() % 3600) // 60)
@@ -478,16 +576,8 @@ def show_email_campaigns():
             # Show email preview for first lead
             if selected_leads:
                 sample_lead = selected_leads[0]
-                preview_subject = subject_line.format(
-                    name=sample_lead['name'],
-                    company=sample_lead['company'],
-                    title=sample_lead['title']
-                )
-                preview_body = email_content.format(
-                    name=sample_lead['name'],
-                    company=sample_lead['company'],
-                    title=sample_lead['title']
-                )
+                preview_subject = personalize(subject_line, sample_lead)
+                preview_body = personalize(email_content, sample_lead)
                 
                 st.subheader("📧 Email Preview (First Lead)")
                 st.write(f"**To:** {sample_lead['email']}")
@@ -516,41 +606,17 @@ def show_email_campaigns():
     st.subheader("📈 Real Campaign Performance")
     
     if all_emails:
-        # Get unique campaign IDs
-        campaign_ids = set([email.get('campaign_id') for email in all_emails if email.get('campaign_id')])
+        # Per-campaign stats, recomputed only when the email logs change
+        campaign_rows = _campaign_rows(get_email_sender().version())
         
-        if campaign_ids:
+        if campaign_rows:
             # Campaign performance table
-            campaign_data = []
-            for campaign_id in campaign_ids:
-                stats = email_sender.get_campaign_stats(campaign_id)
-                campaign_data.append({
-                    'Campaign ID': campaign_id,
-                    'Total Sent': stats['total_sent'],
-                    'Delivered': stats['delivered'],
-                    'Opened': stats['opened'],
-                    'Clicked': stats['clicked'],
-                    'Replied': stats['replied'],
-                    'Delivery Rate': f"{stats['delivery_rate']:.1f}%",
-                    'Open Rate': f"{stats['open_rate']:.1f}%",
-                    'Click Rate': f"{stats['click_rate']:.1f}%",
-                    'Reply Rate': f"{stats['reply_rate']:.1f}%"
-                })
-            
-            campaigns_df = pd.DataFrame(campaign_data)
+            campaigns_df = pd.DataFrame(campaign_rows, columns=_CAMPAIGN_COLUMNS)
             st.dataframe(campaigns_df, use_container_width=True)
             
             # Performance chart
-            if len(campaign_data) > 1:
-                fig = px.bar(
-                    campaigns_df,
-                    x='Campaign ID',
-                    y=['Delivery Rate', 'Open Rate', 'Click Rate', 'Reply Rate'],
-                    title="Campaign Performance Comparison",
-                    barmode='group'
-                )
-                fig.update_layout(xaxis_tickangle=-45)
-                st.plotly_chart(fig, use_container_width=True)
+            if len(campaign_rows) > 1:
+                st.plotly_chart(_campaign_fig(campaign_rows), use_container_width=True)
         else:
             st.info("No campaign data available yet. Send your first campaign to see performance metrics here!")
     else:
@@ -4,14 +4,25 @@ Email Tracking Dashboard - Real-time email status and analytics
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
+import io
+import heapq
 from datetime import datetime, timedelta
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from email_sender import email_sender
+from email_sender import get_email_sender
+
+SENT_STATUSES = frozenset({'sent', 'opened', 'clicked', 'replied'})
+OPENED_STATUSES = frozenset({'opened', 'clicked', 'replied'})
+CLICKED_STATUSES = frozenset({'clicked', 'replied'})
+
+# Live activity feed (icon, accent color) per status
+_STATUS_STYLE = {
+    'opened': ("👁️", "#fa709a"),
+    'clicked': ("🔗", "#a8edea"),
+    'sent': ("🚀", "#4facfe"),
+}
+_DEFAULT_STATUS_STYLE = ("📧", "#4facfe")
 
 def load_tracking_css():
     """Load custom CSS for email tracking page"""
@@ -34,7 +45,9 @@ def load_tracking_css():
         left: 0;
         right: 0;
         bottom: 0;
-        background: url('data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><defs><pattern id="grid" width="10" height="10" patternUnits="userSpaceOnUse"><path d="M 10 0 L 0 0 0 10" fill="none" stroke="rgba(255,255,255,0.1)" stroke-width="0.5"/></pattern></defs><rect width="100" height="100" fill="url(%23grid)"/></svg>');
+        background:
+            repeating-linear-gradient(0deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px),
+            repeating-linear-gradient(90deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px);
         opacity: 0.3;
     }
     
@@ -109,9 +122,108 @@ def load_tracking_css():
     </style>
     """, unsafe_allow_html=True)
 
+@st.cache_data(max_entries=4, show_spinner=False)
+def _emails_df(version):
+    """Email logs as a DataFrame, built once per email sender version"""
+    return pd.DataFrame(get_email_sender().get_all_emails())
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _recipient_emails_lower(version):
+    """Lowercased recipient addresses for the email search box"""
+    return _emails_df(version)['recipient_email'].fillna('').str.lower()
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _campaign_stats_df(version):
+    """get_campaign_stats() for every campaign at once, via one groupby"""
+    df = _emails_df(version)
+    if 'campaign_id' not in df.columns:
+        return pd.DataFrame()
+    df = df[df['campaign_id'].fillna('') != '']
+    if df.empty:
+        return pd.DataFrame()
+    
+    counts = (df.groupby('campaign_id')['status'].value_counts().unstack(fill_value=0)
+              .reindex(columns=['sent', 'opened', 'clicked', 'replied', 'bounced', 'failed'], fill_value=0))
+    total_sent = df.groupby('campaign_id').size()
+    replied = counts['replied']
+    clicked = counts['clicked'] + replied
+    opened = counts['opened'] + clicked
+    delivered = counts['sent'] + opened
+    
+    def rate(part, whole):
+        return (part / whole.where(whole > 0) * 100).fillna(0)
+    
+    stats = pd.DataFrame({
+        'total_sent': total_sent,
+        'delivered': delivered,
+        'opened': opened,
+        'clicked': clicked,
+        'replied': replied,
+        'bounced': counts['bounced'],
+        'failed': counts['failed'],
+        'delivery_rate': rate(delivered, total_sent),
+        'open_rate': rate(opened, delivered),
+        'click_rate': rate(clicked, opened),
+        'reply_rate': rate(replied, delivered)
+    })
+    return stats.rename_axis('campaign_id').reset_index()
+
+# Figures are cached per email sender version so reruns from the filter
+# widgets reuse them; plotly is imported only once there is data to plot
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _status_fig(version):
+    """Status distribution pie for one email sender version"""
+    import plotly.express as px
+    status_counts = _emails_df(version)['status'].value_counts()
+    fig = px.pie(
+        values=status_counts.values,
+        names=status_counts.index,
+        title="Email Status Distribution",
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    # A stable uirevision keeps zoom and legend toggles when new logs arrive
+    fig.update_layout(uirevision='email_status')
+    return fig
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _timeline_fig(version):
+    """Emails sent per day, or None when nothing has a send date"""
+    emails_df = _emails_df(version)
+    if 'sent_at' not in emails_df.columns:
+        return None
+    sent_at = emails_df['sent_at'].dropna()
+    daily_counts = sent_at[sent_at != ''].str[:10].value_counts().sort_index()
+    if daily_counts.empty:
+        return None
+    
+    import plotly.express as px
+    fig = px.line(
+        x=daily_counts.index,
+        y=daily_counts.values,
+        title="Emails Sent Over Time",
+        labels={'x': 'Date', 'y': 'Number of Emails'}
+    )
+    fig.update_layout(xaxis_tickangle=-45, uirevision='email_timeline')
+    return fig
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _campaign_rates_fig(version):
+    """Grouped bar of per-campaign rates for one email sender version"""
+    import plotly.express as px
+    fig = px.bar(
+        _campaign_stats_df(version),
+        x='campaign_id',
+        y=['delivery_rate', 'open_rate', 'click_rate', 'reply_rate'],
+        title="Campaign Performance Rates",
+        barmode='group'
+    )
+    fig.update_layout(xaxis_tickangle=-45, uirevision='campaign_rates')
+    return fig
+
 def show_email_tracking():
     """Email Tracking Dashboard"""
     load_tracking_css()
+    now = datetime.now()
     
     st.markdown("""
     <div class="tracking-header">
@@ -123,6 +235,7 @@ def show_email_tracking():
     """, unsafe_allow_html=True)
     
     # Get all email logs
+    email_sender = get_email_sender()
     all_emails = email_sender.get_all_emails()
     
     if not all_emails:
@@ -133,35 +246,29 @@ def show_email_tracking():
     st.subheader("📊 Overall Email Statistics")
     
     # Calculate overall stats
-    total_emails = len(all_emails)
-    sent_emails = len([e for e in all_emails if e['status'] in ['sent', 'opened', 'clicked', 'replied']])
-    opened_emails = len([e for e in all_emails if e['status'] in ['opened', 'clicked', 'replied']])
-    clicked_emails = len([e for e in all_emails if e['status'] in ['clicked', 'replied']])
-    replied_emails = len([e for e in all_emails if e['status'] == 'replied'])
-    failed_emails = len([e for e in all_emails if e['status'] == 'failed'])
-    bounced_emails = len([e for e in all_emails if e['status'] == 'bounced'])
+    emails_df = _emails_df(email_sender.version())
+    status_counts = emails_df['status'].value_counts()
+    total_emails = len(emails_df)
+    sent_emails = int(status_counts[status_counts.index.isin(SENT_STATUSES)].sum())
+    opened_emails = int(status_counts[status_counts.index.isin(OPENED_STATUSES)].sum())
+    clicked_emails = int(status_counts[status_counts.index.isin(CLICKED_STATUSES)].sum())
+    replied_emails = int(status_counts.get('replied', 0))
+    failed_emails = int(status_counts.get('failed', 0))
+    bounced_emails = int(status_counts.get('bounced', 0))
     
     # Live Activity Feed
     st.subheader("⚡ Live Activity Feed")
-    recent_logs = sorted(all_emails, key=lambda x: x.get('updated_at', ''), reverse=True)[:10]
+    recent_logs = heapq.nlargest(10, all_emails, key=lambda x: x.get('updated_at', ''))
     
     if recent_logs:
+        # One markdown call for the whole feed instead of one per entry
+        feed_rows = []
         for log in recent_logs:
             status = log.get('status', 'unknown')
-            icon = "📧"
-            color = "#4facfe"
-            if status == 'opened': 
-                icon = "👁️"
-                color = "#fa709a"
-            elif status == 'clicked': 
-                icon = "🔗"
-                color = "#a8edea"
-            elif status == 'sent': 
-                icon = "🚀"
-                color = "#4facfe"
-                
+            icon, color = _STATUS_STYLE.get(status, _DEFAULT_STATUS_STYLE)
+            
             time_str = log.get('updated_at', 'unknown').replace('T', ' ').split('.')[0]
-            st.markdown(f"""
+            feed_rows.append(f"""
             <div style="background: rgba(255,255,255,0.05); padding: 10px 15px; border-radius: 10px; border-left: 4px solid {color}; margin-bottom: 8px; display: flex; align-items: center; justify-content: space-between;">
                 <div style="display: flex; align-items: center;">
                     <span style="font-size: 1.2rem; margin-right: 15px;">{icon}</span>
@@ -175,7 +282,8 @@ def show_email_tracking():
                     <div style="font-size: 0.7rem; opacity: 0.6;">{time_str}</div>
                 </div>
             </div>
-            """, unsafe_allow_html=True)
+            """)
+        st.markdown("".join(feed_rows), unsafe_allow_html=True)
     else:
         st.info("No recent activity detected.")
 
@@ -267,21 +375,21 @@ def show_email_tracking():
         search_email = st.text_input("Search by Email", placeholder="Enter email address")
     
     with col3:
-        date_filter = st.date_input("Filter by Date", value=datetime.now().date())
+        date_filter = st.date_input("Filter by Date", value=now.date())
     
     # Filter emails
-    filtered_emails = all_emails
+    mask = pd.Series(True, index=emails_df.index)
     
     if status_filter != "All":
-        filtered_emails = [e for e in filtered_emails if e['status'] == status_filter.lower()]
+        mask &= emails_df['status'] == status_filter.lower()
     
     if search_email:
-        filtered_emails = [e for e in filtered_emails if search_email.lower() in e['recipient_email'].lower()]
+        emails_lower = _recipient_emails_lower(email_sender.version())
+        mask &= emails_lower.str.contains(search_email.lower(), regex=False)
     
-    # Convert to DataFrame for display
-    if filtered_emails:
-        df = pd.DataFrame(filtered_emails)
-        
+    df = emails_df[mask]
+    
+    if len(df):
         # Select columns to display
         display_columns = ['recipient_name', 'recipient_email', 'subject', 'status', 'sent_at', 'opened_at', 'clicked_at', 'replied_at']
         available_columns = [col for col in display_columns if col in df.columns]
@@ -292,12 +400,13 @@ def show_email_tracking():
         # Format timestamps
         for col in ['sent_at', 'opened_at', 'clicked_at', 'replied_at']:
             if col in display_df.columns:
-                display_df[col] = display_df[col].apply(lambda x: x[:19] if x else 'Not tracked')
+                display_df[col] = (pd.to_datetime(display_df[col], errors='coerce', format='ISO8601')
+                                   .dt.strftime('%Y-%m-%d %H:%M:%S').fillna('Not tracked'))
         
         # Rename columns for better display
         display_df.columns = ['Name', 'Email', 'Subject', 'Status', 'Sent At', 'Opened At', 'Clicked At', 'Replied At']
         
-        st.subheader(f"📋 Email Details ({len(filtered_emails)} emails)")
+        st.subheader(f"📋 Email Details ({len(df)} emails)")
         st.dataframe(display_df, use_container_width=True)
         
         # Email actions
@@ -311,19 +420,20 @@ def show_email_tracking():
         
         with col2:
             if st.button("📊 Export Data", type="primary"):
-                csv = display_df.to_csv(index=False)
+                buf = io.BytesIO()
+                display_df.to_csv(buf, index=False, chunksize=10_000, encoding='utf-8')
                 st.download_button(
                     label="Download CSV",
-                    data=csv,
-                    file_name=f"email_tracking_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    data=buf.getvalue(),
+                    file_name=f"email_tracking_{now.strftime('%Y%m%d_%H%M%S')}.csv",
                     mime="text/csv"
                 )
         
         with col3:
             if st.button("🗑️ Clear All Data", type="primary"):
                 if st.button("⚠️ Confirm Delete", type="secondary"):
-                    email_sender.email_logs = []
-                    email_sender.save_email_logs()
+                    get_email_sender().email_logs = []
+                    get_email_sender().save_email_logs()
                     st.success("All email data cleared!")
                     st.rerun()
     
@@ -333,71 +443,27 @@ def show_email_tracking():
     # Status distribution chart
     st.subheader("📊 Status Distribution")
     
-    status_counts = {}
-    for email in all_emails:
-        status = email['status']
-        status_counts[status] = status_counts.get(status, 0) + 1
-    
-    if status_counts:
-        fig = px.pie(
-            values=list(status_counts.values()),
-            names=list(status_counts.keys()),
-            title="Email Status Distribution",
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    if not status_counts.empty:
+        st.plotly_chart(_status_fig(email_sender.version()), use_container_width=True)
     
     # Timeline chart
     st.subheader("📈 Email Timeline")
     
-    # Group emails by date
-    daily_counts = {}
-    for email in all_emails:
-        if email.get('sent_at'):
-            date = email['sent_at'][:10]  # Get date part
-            daily_counts[date] = daily_counts.get(date, 0) + 1
-    
-    if daily_counts:
-        dates = sorted(daily_counts.keys())
-        counts = [daily_counts[date] for date in dates]
-        
-        fig = px.line(
-            x=dates,
-            y=counts,
-            title="Emails Sent Over Time",
-            labels={'x': 'Date', 'y': 'Number of Emails'}
-        )
-        fig.update_layout(xaxis_tickangle=-45)
-        st.plotly_chart(fig, use_container_width=True)
+    timeline_fig = _timeline_fig(email_sender.version())
+    if timeline_fig is not None:
+        st.plotly_chart(timeline_fig, use_container_width=True)
     
     # Campaign performance (if campaign IDs exist)
     st.subheader("🎯 Campaign Performance")
     
-    campaign_ids = set([email.get('campaign_id') for email in all_emails if email.get('campaign_id')])
+    campaign_df = _campaign_stats_df(email_sender.version())
     
-    if campaign_ids:
-        campaign_stats = []
-        for campaign_id in campaign_ids:
-            stats = email_sender.get_campaign_stats(campaign_id)
-            stats['campaign_id'] = campaign_id
-            campaign_stats.append(stats)
+    if not campaign_df.empty:
+        # Display campaign metrics
+        st.dataframe(campaign_df, use_container_width=True)
         
-        if campaign_stats:
-            campaign_df = pd.DataFrame(campaign_stats)
-            
-            # Display campaign metrics
-            st.dataframe(campaign_df, use_container_width=True)
-            
-            # Campaign performance chart
-            fig = px.bar(
-                campaign_df,
-                x='campaign_id',
-                y=['delivery_rate', 'open_rate', 'click_rate', 'reply_rate'],
-                title="Campaign Performance Rates",
-                barmode='group'
-            )
-            fig.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig, use_container_width=True)
+        # Campaign performance chart
+        st.plotly_chart(_campaign_rates_fig(email_sender.version()), use_container_width=True)
     
     else:
         st.info("No campaign data available. Campaigns will be tracked when you send emails through the Email Campaigns page.")
@@ -7,13 +7,130 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+import io
+import re
 from datetime import datetime, timedelta
-import random
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from lead_database import lead_db
-from ai_email_generator import ai_email_generator
+from lead_database import get_lead_db
+from ai_email_generator import get_ai_email_generator
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Source of the simulated scores; 0-100 values fit in int16
+_rng = np.random.default_rng()
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _load_leads_csv(raw: bytes) -> pd.DataFrame:
+    """Parse an uploaded lead CSV, cached by its bytes"""
+    # The multithreaded Arrow parser when available; columns stay NumPy-backed
+    return pd.read_csv(io.BytesIO(raw), engine='pyarrow' if PYARROW_AVAILABLE else 'c')
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _upload_results(raw: bytes) -> dict:
+    """process_lead_data() for an uploaded file, computed once per file"""
+    return process_lead_data(_load_leads_csv(raw))
+
+# Database reads are keyed on LeadDatabase.version(), so widget reruns hit the
+# cache and any add, update or delete is picked up on the next render
+@st.cache_data(ttl=30, max_entries=4, show_spinner=False)
+def _cached_lead_stats(version):
+    """Lead statistics for one database version"""
+    return get_lead_db().get_lead_statistics()
+
+# cache_resource hands back the same list instead of unpickling a copy
+@st.cache_resource(ttl=30, max_entries=16, show_spinner=False)
+def _cached_leads(query, status, min_score, max_score, version):
+    """Leads matching the search and filters for one database version"""
+    return get_lead_db().search_leads(query, status=status, min_score=min_score, max_score=max_score)
+
+# Upload charts are cached on their input data, so reruns from unrelated
+# widgets reuse the built figures
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _score_hist_fig(scores):
+    """Lead score histogram for a tuple of scores"""
+    fig = px.histogram(
+        x=scores,
+        title="Lead Score Distribution",
+        nbins=20,
+        color_discrete_sequence=['#667eea']
+    )
+    fig.update_layout(xaxis_title="Lead Score", yaxis_title="Number of Leads", uirevision='score_hist')
+    return fig
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _score_categories_fig(score_categories):
+    """Hot/warm/cold pie for a tuple of (category, count) pairs"""
+    fig = px.pie(
+        values=[count for _, count in score_categories],
+        names=[name for name, _ in score_categories],
+        title="Lead Score Categories",
+        color_discrete_sequence=['#4CAF50', '#FF9800', '#F44336']
+    )
+    # A stable uirevision keeps zoom and legend toggles when the data changes
+    fig.update_layout(uirevision='score_categories')
+    return fig
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _priority_matrix_fig(names, scores):
+    """Engagement vs value scatter for tuples of lead names and scores"""
+    # Simulated data for the matrix
+    n_matrix = len(names) if names else 50
+    engagement, potential_value = _rng.integers(0, 100, size=(2, n_matrix), dtype=np.int16)
+    
+    # Arrays go to plotly directly; no DataFrame is built for a one-off chart
+    fig = px.scatter(
+        x=engagement,
+        y=potential_value,
+        color=np.asarray(scores) if scores else _rng.integers(0, 100, n_matrix, dtype=np.int16),
+        hover_name=names if names else [f"Lead {i}" for i in range(n_matrix)],
+        labels={'x': 'Engagement', 'y': 'Potential Value', 'color': 'Score'},
+        title="Lead Engagement vs Value Matrix",
+        color_continuous_scale='RdYlGn'
+    )
+    # Add quadrant lines
+    fig.add_hline(y=50, line_dash="dash", line_color="gray")
+    fig.add_vline(x=50, line_dash="dash", line_color="gray")
+    fig.update_layout(uirevision='priority_matrix')
+    return fig
+
+# Rows shown per page of the leads table
+LEADS_PAGE_SIZE = 200
+
+LEAD_DISPLAY_COLUMNS = ('name', 'email', 'company', 'title', 'score', 'status', 'created_at')
+
+def _leads_table(leads):
+    """Display columns of the given leads, as an Arrow table when pyarrow is available"""
+    # Columns are gathered straight from the lead dicts, skipping the row-wise
+    # DataFrame build; Streamlit sends an Arrow table to the browser as-is
+    columns = {
+        col: [lead.get(col) for lead in leads]
+        for col in LEAD_DISPLAY_COLUMNS
+        if any(col in lead for lead in leads)
+    }
+    if PYARROW_AVAILABLE:
+        try:
+            return pa.table(columns)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type columns from older records; pandas handles those
+            pass
+    return pd.DataFrame(columns)
+
+# Score filter option -> inclusive (min_score, max_score) range
+SCORE_FILTER_RANGES = {
+    "All": (None, None),
+    "Hot Leads (80-100)": (80, None),
+    "Warm Leads (60-79)": (60, 79),
+    "Cold Leads (0-59)": (None, 59),
+}
 
 def load_lead_management_css():
     """Load custom CSS for lead management page"""
@@ -36,7 +153,9 @@ def load_lead_management_css():
         left: 0;
         right: 0;
         bottom: 0;
-        background: url('data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><defs><pattern id="grid" width="10" height="10" patternUnits="userSpaceOnUse"><path d="M 10 0 L 0 0 0 10" fill="none" stroke="rgba(255,255,255,0.1)" stroke-width="0.5"/></pattern></defs><rect width="100" height="100" fill="url(%23grid)"/></svg>');
+        background:
+            repeating-linear-gradient(0deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px),
+            repeating-linear-gradient(90deg, transparent 0 9px, rgba(255,255,255,0.1) 9px 10px);
         opacity: 0.3;
     }
     
@@ -93,38 +212,116 @@ def process_lead_data(df):
         'total_leads': len(df),
         'valid_emails': 0,
         'duplicates': 0,
+        'duplicate_mask': np.zeros(len(df), dtype=bool),
         'missing_data': 0,
+        'missing_by_column': {},
         'processed_leads': []
     }
     
     # Check for valid emails
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     if 'email' in df.columns:
-        results['valid_emails'] = df['email'].str.match(email_pattern, na=False).sum()
-    
-    # Check for duplicates
+        if PYARROW_AVAILABLE:
+            # Arrow evaluates the regex in C++ (RE2) over the whole column
+            emails = pa.array(df['email'].fillna('').astype(str), type=pa.string())
+            results['valid_emails'] = int(pc.sum(pc.match_substring_regex(emails, EMAIL_RE.pattern)).as_py() or 0)
+        else:
+            results['valid_emails'] = df['email'].str.match(EMAIL_RE, na=False).sum()
+    
+    # Check for duplicates; the row mask is kept so the page can list them
     if 'email' in df.columns:
-        results['duplicates'] = df['email'].duplicated().sum()
-    
-    # Check for missing data
-    results['missing_data'] = df.isnull().sum().sum()
-    
-    # Process each lead
-    for idx, row in df.iterrows():
-        lead = {
-            'id': idx + 1,
-            'name': row.get('name', 'N/A'),
-            'email': row.get('email', 'N/A'),
-            'company': row.get('company', 'N/A'),
-            'phone': row.get('phone', 'N/A'),
-            'title': row.get('title', 'N/A'),
-            'score': random.randint(20, 95),  # Simulate AI scoring
-            'status': 'New'
-        }
-        results['processed_leads'].append(lead)
+        results['duplicate_mask'] = df['email'].duplicated().to_numpy()
+        results['duplicates'] = int(np.count_nonzero(results['duplicate_mask']))
+    
+    # Check for missing data: one pass over the null mask gives the per-column
+    # counts, and the total is summed from those
+    missing_counts = df.isna().to_numpy().sum(axis=0).tolist()
+    results['missing_by_column'] = {col: n for col, n in zip(df.columns, missing_counts) if n}
+    results['missing_data'] = sum(missing_counts)
+    
+    # Process all leads at once: one records conversion, one score draw
+    records = df.reindex(columns=['name', 'email', 'company', 'phone', 'title']).fillna('N/A').to_dict('records')
+    scores = _rng.integers(20, 96, size=len(df), dtype=np.int16).tolist()  # Simulate AI scoring
+    results['processed_leads'] = [
+        {'id': idx + 1, **record, 'score': score, 'status': 'New'}
+        for idx, record, score in zip(df.index, records, scores)
+    ]
     
     return results
 
+@st.fragment
+def _leads_section():
+    """Lead search, filters, table and quick actions; filter changes rerun only this fragment"""
+    lead_db = get_lead_db()
+    
+    # Search and filter leads
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        search_query = st.text_input("🔍 Search Leads", placeholder="Search by name, email, or company")
+    
+    with col2:
+        status_filter = st.selectbox("📊 Filter by Status", ["All", "New", "Contacted", "Qualified", "Converted"])
+    
+    with col3:
+        score_filter = st.selectbox("🎯 Filter by Score", ["All", "Hot Leads (80-100)", "Warm Leads (60-79)", "Cold Leads (0-59)"])
+    
+    # Get filtered leads
+    min_score, max_score = SCORE_FILTER_RANGES[score_filter]
+    filtered_leads = _cached_leads(
+        search_query,
+        None if status_filter == "All" else status_filter,
+        min_score,
+        max_score,
+        lead_db.version(),
+    )
+    
+    # Display leads
+    if filtered_leads:
+        st.write(f"**Found {len(filtered_leads)} leads**")
+        
+        # Only the current page is converted and sent to the browser
+        page_count = (len(filtered_leads) + LEADS_PAGE_SIZE - 1) // LEADS_PAGE_SIZE
+        page = 1
+        if page_count > 1:
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+        start = (page - 1) * LEADS_PAGE_SIZE
+        
+        st.dataframe(_leads_table(filtered_leads[start:start + LEADS_PAGE_SIZE]), use_container_width=True)
+        
+        # Lead actions
+        st.subheader("⚡ Quick Actions")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            if st.button("📧 Generate AI Email", type="primary"):
+                if filtered_leads:
+                    # Select first lead for demo
+                    selected_lead = filtered_leads[0]
+                    email_content = get_ai_email_generator().generate_email(selected_lead, 'professional')
+                    
+                    st.markdown(f"""
+                    <div class="success-box">
+                        <h4>🤖 AI Generated Email for {selected_lead['name']}</h4>
+                        <p><strong>Subject:</strong> {email_content['subject']}</p>
+                        <p><strong>Body:</strong></p>
+                        <pre style="white-space: pre-wrap; color: #2d5016;">{email_content['body']}</pre>
+                    </div>
+                    """, unsafe_allow_html=True)
+        
+        with col2:
+            if st.button("📊 Export Leads", type="primary"):
+                filename = lead_db.export_leads('csv')
+                if filename:
+                    st.success(f"✅ Leads exported to {filename}")
+        
+        with col3:
+            if st.button("🔄 Refresh Data", type="primary", key="refresh_leads"):
+                st.rerun()
+    
+    else:
+        st.info("No leads found. Upload a CSV file to get started!")
+
 def show_lead_management():
     """Lead Management Dashboard"""
     load_lead_management_css()
@@ -139,7 +336,8 @@ def show_lead_management():
     """, unsafe_allow_html=True)
     
     # Lead Statistics
-    stats = lead_db.get_lead_statistics()
+    lead_db = get_lead_db()
+    stats = _cached_lead_stats(lead_db.version())
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -192,8 +390,10 @@ def show_lead_management():
     
     if uploaded_file is not None:
         try:
-            # Load the CSV file
-            df = pd.read_csv(uploaded_file)
+            # Load the CSV file; parsing and scoring are cached per file, so
+            # widget reruns neither reparse it nor redraw the simulated scores
+            raw = uploaded_file.getvalue()
+            df = _load_leads_csv(raw)
             
             st.markdown(f"""
             <div class="success-box">
@@ -203,27 +403,19 @@ def show_lead_management():
             """, unsafe_allow_html=True)
             
             # Process the data
-            results = process_lead_data(df)
+            results = _upload_results(raw)
             
             # Category input
             category = st.text_input("📂 Category for these leads", value="General", 
                                     placeholder="e.g., Graphic Design Clients, Web Development, etc.")
             
             if st.button("💾 Save Leads to Database", type="primary"):
-                lead_data_list = []
-                for idx, row in df.iterrows():
-                    lead_data = {
-                        'name': row.get('name', ''),
-                        'email': row.get('email', ''),
-                        'company': row.get('company', ''),
-                        'phone': row.get('phone', ''),
-                        'title': row.get('title', ''),
-                        'industry': row.get('industry', ''),
-                        'source': 'CSV Upload',
-                        'category': category,
-                        'score': random.randint(20, 95)
-                    }
-                    lead_data_list.append(lead_data)
+                records = df.reindex(columns=['name', 'email', 'company', 'phone', 'title', 'industry']).fillna('').to_dict('records')
+                scores = _rng.integers(20, 96, size=len(df), dtype=np.int16).tolist()
+                lead_data_list = [
+                    {**record, 'source': 'CSV Upload', 'category': category, 'score': score}
+                    for record, score in zip(records, scores)
+                ]
                 
                 lead_ids = lead_db.add_leads_bulk(lead_data_list)
                 st.success(f"✅ Successfully saved {len(lead_ids)} leads to database in category '{category}'!")
@@ -281,12 +473,16 @@ def show_lead_management():
                     <p>{results['duplicates']} duplicate email addresses detected. Consider removing duplicates for better campaign performance.</p>
                 </div>
                 """, unsafe_allow_html=True)
+                with st.expander("Show duplicate rows"):
+                    st.dataframe(df[results['duplicate_mask']].head(100), use_container_width=True)
             
             if results['missing_data'] > 0:
+                missing_columns = ", ".join(f"{col} ({n})" for col, n in results['missing_by_column'].items())
                 st.markdown(f"""
                 <div class="warning-box">
                     <h4>⚠️ Missing Data Detected</h4>
                     <p>{results['missing_data']} missing data points found. Consider filling missing values for better personalization.</p>
+                    <p><strong>Columns:</strong> {missing_columns}</p>
                 </div>
                 """, unsafe_allow_html=True)
             
@@ -297,63 +493,36 @@ def show_lead_management():
             leads_df = pd.DataFrame(results['processed_leads'])
             
             # Score distribution
-            fig_score = px.histogram(
-                leads_df, 
-                x='score',
-                title="Lead Score Distribution",
-                nbins=20,
-                color_discrete_sequence=['#667eea']
-            )
-            fig_score.update_layout(xaxis_title="Lead Score", yaxis_title="Number of Leads")
-            st.plotly_chart(fig_score, use_container_width=True)
+            scores = tuple(lead['score'] for lead in results['processed_leads'])
+            st.plotly_chart(_score_hist_fig(scores), use_container_width=True)
             
             # Score categories
-            score_categories = {
-                'Hot Leads (80-100)': len(leads_df[leads_df['score'] >= 80]),
-                'Warm Leads (60-79)': len(leads_df[(leads_df['score'] >= 60) & (leads_df['score'] < 80)]),
-                'Cold Leads (0-59)': len(leads_df[leads_df['score'] < 60])
-            }
-            
-            fig_categories = px.pie(
-                values=list(score_categories.values()),
-                names=list(score_categories.keys()),
-                title="Lead Score Categories",
-                color_discrete_sequence=['#4CAF50', '#FF9800', '#F44336']
+            # Bucket 0 is cold (<60), 1 warm (60-79), 2 hot (>=80), counted in one pass
+            cold, warm, hot = np.bincount(np.searchsorted([60, 80], scores, side='right'), minlength=3).tolist()
+            score_categories = (
+                ('Hot Leads (80-100)', hot),
+                ('Warm Leads (60-79)', warm),
+                ('Cold Leads (0-59)', cold)
             )
-            st.plotly_chart(fig_categories, use_container_width=True)
+            st.plotly_chart(_score_categories_fig(score_categories), use_container_width=True)
             
             # Lead Priority Matrix
             st.divider()
             st.subheader("⭐ AI Lead Priority Matrix")
             st.write("Leads are mapped based on their engagement history and potential value.")
             
-            # Simulated data for the matrix
-            n_matrix = len(leads_df) if len(leads_df) > 0 else 50
-            matrix_df = pd.DataFrame({
-                'Engagement': np.random.randint(0, 100, n_matrix),
-                'Potential Value': np.random.randint(0, 100, n_matrix),
-                'Lead Name': leads_df['name'] if len(leads_df) > 0 else [f"Lead {i}" for i in range(n_matrix)],
-                'Score': leads_df['score'] if len(leads_df) > 0 else np.random.randint(0, 100, n_matrix)
-            })
-            
-            fig_matrix = px.scatter(
-                matrix_df, 
-                x='Engagement', 
-                y='Potential Value',
-                color='Score',
-                hover_data=['Lead Name'],
-                title="Lead Engagement vs Value Matrix",
-                color_continuous_scale='RdYlGn'
-            )
-            # Add quadrant lines
-            fig_matrix.add_hline(y=50, line_dash="dash", line_color="gray")
-            fig_matrix.add_vline(x=50, line_dash="dash", line_color="gray")
-            
-            st.plotly_chart(fig_matrix, use_container_width=True)
+            names = tuple(lead['name'] for lead in results['processed_leads'])
+            st.plotly_chart(_priority_matrix_fig(names, scores), use_container_width=True)
             
             # Top leads table
             st.subheader("⭐ Top Scoring Leads")
-            top_leads = leads_df.nlargest(10, 'score')[['name', 'email', 'company', 'score']]
+            # argpartition finds the top 10 in linear time; only those are then
+            # sorted, by score and then position, matching nlargest's order
+            score_array = np.asarray(scores)
+            k = min(10, len(score_array))
+            top_idx = np.argpartition(-score_array, k - 1)[:k] if k else np.empty(0, dtype=np.intp)
+            top_idx = top_idx[np.lexsort((top_idx, -score_array[top_idx]))]
+            top_leads = leads_df.iloc[top_idx][['name', 'email', 'company', 'score']]
             st.dataframe(top_leads, use_container_width=True)
             
             # Export processed data
@@ -378,9 +547,9 @@ def show_lead_management():
                         'Valid Emails': results['valid_emails'],
                         'Duplicates': results['duplicates'],
                         'Missing Data': results['missing_data'],
-                        'Hot Leads': score_categories['Hot Leads (80-100)'],
-                        'Warm Leads': score_categories['Warm Leads (60-79)'],
-                        'Cold Leads': score_categories['Cold Leads (0-59)']
+                        'Hot Leads': hot,
+                        'Warm Leads': warm,
+                        'Cold Leads': cold
                     }
                     
                     report_df = pd.DataFrame(list(report_data.items()), columns=['Metric', 'Value'])
@@ -473,80 +642,7 @@ def show_lead_management():
     st.markdown("---")
     st.subheader("👥 Manage Your Leads")
     
-    # Search and filter leads
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        search_query = st.text_input("🔍 Search Leads", placeholder="Search by name, email, or company")
-    
-    with col2:
-        status_filter = st.selectbox("📊 Filter by Status", ["All", "New", "Contacted", "Qualified", "Converted"])
-    
-    with col3:
-        score_filter = st.selectbox("🎯 Filter by Score", ["All", "Hot Leads (80-100)", "Warm Leads (60-79)", "Cold Leads (0-59)"])
-    
-    # Get filtered leads
-    all_leads = lead_db.get_all_leads()
-    filtered_leads = all_leads
-    
-    if search_query:
-        filtered_leads = lead_db.search_leads(search_query)
-    
-    if status_filter != "All":
-        filtered_leads = [lead for lead in filtered_leads if lead['status'] == status_filter]
-    
-    if score_filter != "All":
-        if score_filter == "Hot Leads (80-100)":
-            filtered_leads = [lead for lead in filtered_leads if lead['score'] >= 80]
-        elif score_filter == "Warm Leads (60-79)":
-            filtered_leads = [lead for lead in filtered_leads if 60 <= lead['score'] < 80]
-        elif score_filter == "Cold Leads (0-59)":
-            filtered_leads = [lead for lead in filtered_leads if lead['score'] < 60]
-    
-    # Display leads
-    if filtered_leads:
-        st.write(f"**Found {len(filtered_leads)} leads**")
-        
-        # Convert to DataFrame for display
-        leads_df = pd.DataFrame(filtered_leads)
-        display_columns = ['name', 'email', 'company', 'title', 'score', 'status', 'created_at']
-        available_columns = [col for col in display_columns if col in leads_df.columns]
-        
-        st.dataframe(leads_df[available_columns], use_container_width=True)
-        
-        # Lead actions
-        st.subheader("⚡ Quick Actions")
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if st.button("📧 Generate AI Email", type="primary"):
-                if filtered_leads:
-                    # Select first lead for demo
-                    selected_lead = filtered_leads[0]
-                    email_content = ai_email_generator.generate_email(selected_lead, 'professional')
-                    
-                    st.markdown(f"""
-                    <div class="success-box">
-                        <h4>🤖 AI Generated Email for {selected_lead['name']}</h4>
-                        <p><strong>Subject:</strong> {email_content['subject']}</p>
-                        <p><strong>Body:</strong></p>
-                        <pre style="white-space: pre-wrap; color: #2d5016;">{email_content['body']}</pre>
-                    </div>
-                    """, unsafe_allow_html=True)
-        
-        with col2:
-            if st.button("📊 Export Leads", type="primary"):
-                filename = lead_db.export_leads('csv')
-                if filename:
-                    st.success(f"✅ Leads exported to {filename}")
-        
-        with col3:
-            if st.button("🔄 Refresh Data", type="primary", key="refresh_leads"):
-                st.rerun()
-    
-    else:
-        st.info("No leads found. Upload a CSV file to get started!")
+    _leads_section()
 
 if __name__ == "__main__":
     show_lead_management()
\ No newline at end of file
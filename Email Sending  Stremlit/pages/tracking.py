@@ -21,8 +21,8 @@ def show_tracking():
             email_id = query_params.get('email_id', '')
             if email_id:
                 try:
-                    from email_sender import email_sender
-                    email_sender.track_email_open(email_id)
+                    from email_sender import get_email_sender
+                    get_email_sender().track_email_open(email_id)
                     st.success(f"Email {email_id} opened and tracked!")
                 except Exception as e:
                     st.error(f"Tracking error: {e}")
@@ -40,8 +40,8 @@ def show_tracking():
             url = query_params.get('url', '')
             if email_id and url:
                 try:
-                    from email_sender import email_sender
-                    email_sender.track_email_click(email_id, url)
+                    from email_sender import get_email_sender
+                    get_email_sender().track_email_click(email_id, url)
                     st.success(f"Click on {email_id} tracked! Redirecting to {url}")
                 except Exception as e:
                     st.error(f"Tracking error: {e}")
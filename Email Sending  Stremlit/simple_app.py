@@ -151,14 +151,14 @@ def show_dashboard():
     
     # Get real data
     try:
-        from lead_database import lead_db
-        from email_sender import email_sender
+        from lead_database import get_lead_db
+        from email_sender import get_email_sender
         
         # Lead statistics
-        lead_stats = lead_db.get_lead_statistics()
+        lead_stats = get_lead_db().get_lead_statistics()
         
         # Email statistics
-        all_emails = email_sender.get_all_emails()
+        all_emails = get_email_sender().get_all_emails()
         total_emails = len(all_emails)
         sent_emails = len([e for e in all_emails if e['status'] in ['sent', 'opened', 'clicked', 'replied']])
         opened_emails = len([e for e in all_emails if e['status'] in ['opened', 'clicked', 'replied']])
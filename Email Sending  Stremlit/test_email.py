@@ -34,7 +34,8 @@ def test_email_tracking():
             return
         
         try:
-            from email_sender import email_sender
+            from email_sender import get_email_sender
+            email_sender = get_email_sender()
             
             # Set credentials
             email_sender.smtp_server = smtp_server
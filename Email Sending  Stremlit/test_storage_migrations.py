@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Test the lead and email tracking storage: legacy imports, reloads and compaction
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def _legacy_leads():
+    """Leads as the old json.dump wrote them, NaN included"""
+    return [
+        {'id': f'lead-{i}', 'name': f'Lead {i}', 'email': f'lead{i}@example.com',
+         'company': 'Example', 'phone': float('nan'), 'score': 50 + i,
+         'status': 'New', 'tags': []}
+        for i in range(3)
+    ]
+
+def test_legacy_leads_import():
+    """Test that a legacy leads file with NaN is imported into the JSONL log"""
+    from lead_database import LeadDatabase
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(tmp_dir, 'leads_database.jsonl')
+        with open(os.path.join(tmp_dir, 'leads_database.json'), 'w', encoding='utf-8') as f:
+            json.dump(_legacy_leads(), f)
+        
+        db = LeadDatabase(db_file)
+        if len(db.get_all_leads()) != 3 or not os.path.exists(db_file):
+            print("❌ Legacy leads were not imported")
+            return False
+        
+        reloaded = LeadDatabase(db_file)
+        if [lead['id'] for lead in reloaded.get_all_leads()] != ['lead-0', 'lead-1', 'lead-2']:
+            print("❌ Imported leads did not survive a reload")
+            return False
+        print("✅ Legacy leads with NaN imported")
+        return True
+    except Exception as e:
+        print(f"❌ Legacy leads import failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_failed_leads_import_retries():
+    """Test that an unreadable legacy file is not replaced by an empty database"""
+    from lead_database import LeadDatabase
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(tmp_dir, 'leads_database.jsonl')
+        legacy_file = os.path.join(tmp_dir, 'leads_database.json')
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(_legacy_leads())[:-20])
+        
+        try:
+            LeadDatabase(db_file)
+            print("❌ A truncated legacy file loaded without an error")
+            return False
+        except ValueError:
+            pass
+        if os.path.exists(db_file):
+            print("❌ A failed import left a database file behind")
+            return False
+        
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            json.dump(_legacy_leads(), f)
+        if len(LeadDatabase(db_file).get_all_leads()) != 3:
+            print("❌ The import was not retried")
+            return False
+        print("✅ Failed leads import is retried")
+        return True
+    except Exception as e:
+        print(f"❌ Leads import retry test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_leads_reload():
+    """Test that a reload keeps the latest record per lead and drops deleted ones"""
+    from lead_database import LeadDatabase
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(tmp_dir, 'leads_database.jsonl')
+        db = LeadDatabase(db_file)
+        first = db.add_lead({'name': 'First', 'email': 'first@example.com', 'score': 40})
+        second = db.add_lead({'name': 'Second', 'email': 'second@example.com'})
+        db.flush()
+        db.update_lead(first, {'status': 'Contacted', 'score': 85})
+        db.delete_lead(second)
+        db.flush()
+        
+        reloaded = LeadDatabase(db_file)
+        lead = reloaded.get_lead(first)
+        if lead is None or lead['status'] != 'Contacted' or lead['score'] != 85:
+            print("❌ The latest lead update was not kept")
+            return False
+        if reloaded.get_lead(second) is not None or len(reloaded.get_all_leads()) != 1:
+            print("❌ A deleted lead came back after a reload")
+            return False
+        if [l['id'] for l in reloaded.get_hot_leads()] != [first]:
+            print("❌ Reloaded leads were not indexed")
+            return False
+        print("✅ Updates and deletes survive a reload")
+        return True
+    except Exception as e:
+        print(f"❌ Leads reload test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_leads_compaction():
+    """Test that superseded records are compacted away on flush"""
+    from lead_database import LeadDatabase
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(tmp_dir, 'leads_database.jsonl')
+        db = LeadDatabase(db_file)
+        lead_ids = db.add_leads_bulk([{'name': f'Lead {i}'} for i in range(3)])
+        db.flush()
+        for score in range(60, 64):
+            db.update_lead(lead_ids[0], {'score': score})
+            db.flush()
+        
+        with open(db_file, 'rb') as f:
+            line_count = sum(1 for _ in f)
+        if line_count != 3:
+            print(f"❌ Expected 3 lines after compaction, found {line_count}")
+            return False
+        if LeadDatabase(db_file).get_lead(lead_ids[0])['score'] != 63:
+            print("❌ Compaction lost the latest update")
+            return False
+        print("✅ Superseded records compacted")
+        return True
+    except Exception as e:
+        print(f"❌ Leads compaction test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _legacy_logs():
+    """Email logs as the old json.dump wrote them, NaN included"""
+    return [
+        {'id': f'email-{i}', 'campaign_id': 'legacy', 'recipient_email': f'lead{i}@example.com',
+         'status': 'sent', 'sent_at': '2024-01-01T09:00:00', 'opened_at': float('nan'),
+         'clicked_at': float('nan')}
+        for i in range(3)
+    ]
+
+def _open_email_sender(tmp_dir):
+    """Create an EmailSender whose tracking files live in tmp_dir"""
+    from email_sender import EmailSender
+    cwd = os.getcwd()
+    os.chdir(tmp_dir)
+    try:
+        return EmailSender()
+    finally:
+        os.chdir(cwd)
+
+def test_legacy_logs_import():
+    """Test that a legacy tracking file with NaN is imported into SQLite"""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(tmp_dir, 'email_tracking.json'), 'w', encoding='utf-8') as f:
+            json.dump(_legacy_logs(), f)
+        
+        sender = _open_email_sender(tmp_dir)
+        sender._conn.close()
+        if len(sender.get_all_emails()) != 3 or sender.get_email_status('email-0')['opened_at'] is not None:
+            print("❌ Legacy email logs were not imported")
+            return False
+        
+        # Once migrated, the legacy file is not read again
+        os.remove(os.path.join(tmp_dir, 'email_tracking.json'))
+        reloaded = _open_email_sender(tmp_dir)
+        reloaded._conn.close()
+        if [e['id'] for e in reloaded.get_all_emails()] != ['email-0', 'email-1', 'email-2']:
+            print("❌ Imported email logs did not survive a reload")
+            return False
+        print("✅ Legacy email logs with NaN imported")
+        return True
+    except Exception as e:
+        print(f"❌ Legacy email logs import failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_failed_logs_import_retries():
+    """Test that a failed tracking import is retried on the next start"""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        legacy_file = os.path.join(tmp_dir, 'email_tracking.json')
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(_legacy_logs())[:-20])
+        
+        sender = _open_email_sender(tmp_dir)
+        sender._conn.close()
+        if sender.get_all_emails():
+            print("❌ A truncated tracking file imported logs")
+            return False
+        
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            json.dump(_legacy_logs(), f)
+        retried = _open_email_sender(tmp_dir)
+        retried._conn.close()
+        if len(retried.get_all_emails()) != 3:
+            print("❌ The empty database blocked the import retry")
+            return False
+        print("✅ Failed email logs import is retried")
+        return True
+    except Exception as e:
+        print(f"❌ Email logs import retry test failed: {e}")
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def main():
+    """Run all storage tests"""
+    print("🧪 Testing Storage...")
+    print("=" * 50)
+    
+    tests = [
+        ("Legacy Leads Import", test_legacy_leads_import),
+        ("Leads Import Retry", test_failed_leads_import_retries),
+        ("Leads Reload", test_leads_reload),
+        ("Leads Compaction", test_leads_compaction),
+        ("Legacy Email Logs Import", test_legacy_logs_import),
+        ("Email Logs Import Retry", test_failed_logs_import_retries),
+    ]
+    
+    passed = 0
+    total = len(tests)
+    
+    for test_name, test_func in tests:
+        print(f"\n📋 Running {test_name} test...")
+        if test_func():
+            passed += 1
+            print(f"✅ {test_name} test passed")
+        else:
+            print(f"❌ {test_name} test failed")
+    
+    print(f"\n📊 Storage Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -3,7 +3,7 @@ Email Tracking Handler - Handle email opens and clicks
 """
 
 import streamlit as st
-from email_sender import email_sender
+from email_sender import get_email_sender
 import sys
 import os
 
@@ -26,7 +26,7 @@ def handle_tracking():
             # Handle email open tracking
             email_id = query_params.get('email_id')
             if email_id:
-                email_sender.track_email_open(email_id)
+                get_email_sender().track_email_open(email_id)
                 # Return a 1x1 transparent pixel in markdown
                 st.markdown("""
                 <div style="position: fixed; top: 0; left: 0; width: 1px; height: 1px; opacity: 0;">
@@ -41,7 +41,7 @@ def handle_tracking():
             email_id = query_params.get('email_id')
             url = query_params.get('url')
             if email_id and url:
-                email_sender.track_email_click(email_id, url)
+                get_email_sender().track_email_click(email_id, url)
                 # Redirect to the actual URL
                 st.markdown(f"""
                 <script>